@@ -0,0 +1,409 @@
+"""
+Walk-forward бэктест моделей прогнозирования
+
+Каждая зарегистрированная модель обучается на расширяющемся окне истории
+локальных фикстур (benchmarks/fixtures/{TICKER}.csv) и прогнозирует
+следующие horizon дней. Точки отсчета сдвигаются на horizon дней, пока
+не закончится история (rolling origin). Прогоны (тикер, фолд, модель)
+выполняются параллельно в отдельных процессах.
+
+Для каждой модели в отчете: RMSE и MAPE прогноза, время обучения,
+пиковая память процесса и задержка predict. Отчет в JSON можно сравнить
+с отчетом предыдущего релиза, чтобы найти регрессии.
+
+Запуск из корня проекта:
+    python -m benchmarks.backtest --output report.json
+    python -m benchmarks.backtest --set LSTM_EPOCHS=5 --compare baseline.json
+    python -m benchmarks.backtest --make-fixtures
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+from config import config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Параметры генерации фикстур: 3 года дневных свечей
+FIXTURE_BARS = 756
+FIXTURE_END = '2025-12-31'
+
+# Допустимое ухудшение метрик при сравнении отчетов (доля)
+DEFAULT_TOLERANCE = {
+    'rmse': 0.10,
+    'mape': 0.10,
+    'train_seconds': 0.25,
+    'predict_ms': 0.25,
+    'peak_rss_mb': 0.15,
+}
+
+
+def make_fixtures(directory: str = FIXTURES_DIR, bars: int = FIXTURE_BARS, seed: int = 42):
+    """
+    Генерация синтетических фикстур с разным характером ряда
+
+    TREND — рост с умеренной волатильностью, RANGE — возврат к среднему,
+    VOLAT — высокая волатильность со скачками
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=FIXTURE_END, periods=bars, name='date')
+
+    trend = 100 * np.exp(np.cumsum(0.0006 + 0.012 * rng.standard_normal(bars)))
+
+    range_prices = np.empty(bars)
+    range_prices[0] = 50.0
+    for i in range(1, bars):
+        range_prices[i] = range_prices[i - 1] + 0.05 * (50.0 - range_prices[i - 1]) + 0.8 * rng.standard_normal()
+
+    jumps = rng.choice([0.0, -0.08, 0.08], size=bars, p=[0.98, 0.01, 0.01])
+    volat = 30 * np.exp(np.cumsum(0.035 * rng.standard_normal(bars) + jumps))
+
+    os.makedirs(directory, exist_ok=True)
+    for ticker, prices in (('TREND', trend), ('RANGE', range_prices), ('VOLAT', volat)):
+        df = pd.DataFrame({'price': np.round(prices, 4)}, index=index)
+        df.to_csv(os.path.join(directory, f'{ticker}.csv'))
+        print(f"{ticker}: {len(df)} свечей")
+
+
+def load_fixture(directory: str, ticker: str) -> pd.DataFrame:
+    """Загрузка фикстуры в формате DataService (колонка price, DatetimeIndex)"""
+    df = pd.read_csv(os.path.join(directory, f'{ticker}.csv'), index_col='date', parse_dates=True)
+    df.index.name = 'Date'
+    return df[['price']].astype(float)
+
+
+def fold_origins(n_bars: int, n_folds: int, horizon: int, min_train: int) -> List[int]:
+    """
+    Точки отсчета фолдов: последний фолд заканчивается на последней свече
+
+    Returns:
+        Индексы первых свечей прогнозного окна (история — data[:origin])
+    """
+    origins = [n_bars - (n_folds - k) * horizon for k in range(n_folds)]
+    return [origin for origin in origins if origin >= min_train]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS текущего процесса, МБ"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — КБ, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _apply_overrides(overrides: Dict[str, object]):
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+
+def run_fold(
+        model_name: str,
+        ticker: str,
+        fold: int,
+        history: pd.DataFrame,
+        actual: np.ndarray,
+        n_threads: int,
+        predict_repeats: int,
+        overrides: Dict[str, object]
+) -> Dict[str, object]:
+    """
+    Один прогон walk-forward: обучение на history и прогноз len(actual) дней
+
+    Выполняется в отдельном процессе (один прогон на процесс), поэтому
+    пиковый RSS процесса относится только к этому прогону
+
+    Returns:
+        Словарь с метриками прогона
+    """
+    _apply_overrides(overrides)
+    from models.registry import model_registry
+
+    record = {
+        'model': model_name,
+        'ticker': ticker,
+        'fold': fold,
+        'train_bars': len(history),
+        'origin': pd.Timestamp(history.index[-1]).strftime('%Y-%m-%d'),
+    }
+
+    try:
+        model = model_registry.create(model_name)
+        model.set_cpu_budget(n_threads)
+        rss_before = _peak_rss_mb()
+
+        with threadpool_limits(limits=n_threads):
+            start = time.perf_counter()
+            holdout_rmse = model.train(history, train_size=config.TRAIN_SIZE)
+            train_seconds = time.perf_counter() - start
+
+            horizon = len(actual)
+            latencies = []
+            for _ in range(predict_repeats):
+                start = time.perf_counter()
+                predictions = np.asarray(model.predict(horizon), dtype=float)
+                latencies.append(time.perf_counter() - start)
+
+        errors = predictions - actual
+        peak_rss = _peak_rss_mb()
+        record.update({
+            'ok': True,
+            'rmse': float(np.sqrt(np.mean(errors ** 2))),
+            'mape': float(np.mean(np.abs(errors) / np.abs(actual)) * 100),
+            'holdout_rmse': float(holdout_rmse),
+            'train_seconds': train_seconds,
+            'predict_ms': statistics.median(latencies) * 1000,
+            'peak_rss_mb': peak_rss,
+            'rss_growth_mb': None if peak_rss is None else peak_rss - rss_before,
+        })
+    except Exception as e:
+        record.update({
+            'ok': False,
+            'error': f'{type(e).__name__}: {e}',
+            'traceback': traceback.format_exc(),
+        })
+
+    return record
+
+
+def summarize(records: List[Dict[str, object]]) -> Dict[str, Dict[str, object]]:
+    """
+    Сводка по моделям
+
+    Точность — среднее по фолдам, время и задержка — медиана,
+    память — максимум
+    """
+    summary = {}
+    for model_name in dict.fromkeys(record['model'] for record in records):
+        runs = [record for record in records if record['model'] == model_name]
+        ok = [record for record in runs if record['ok']]
+        entry = {'runs': len(runs), 'failures': len(runs) - len(ok)}
+        if ok:
+            rss = [record['peak_rss_mb'] for record in ok if record['peak_rss_mb'] is not None]
+            entry.update({
+                'rmse': statistics.fmean(record['rmse'] for record in ok),
+                'mape': statistics.fmean(record['mape'] for record in ok),
+                'train_seconds': statistics.median(record['train_seconds'] for record in ok),
+                'predict_ms': statistics.median(record['predict_ms'] for record in ok),
+                'peak_rss_mb': max(rss) if rss else None,
+            })
+        summary[model_name] = entry
+    return summary
+
+
+def run_backtest(
+        fixtures_dir: str,
+        tickers: List[str],
+        model_names: List[str],
+        n_folds: int,
+        horizon: int,
+        workers: int,
+        predict_repeats: int,
+        overrides: Dict[str, object]
+) -> Dict[str, object]:
+    """
+    Запуск бэктеста
+
+    Returns:
+        Отчет: параметры запуска, результаты прогонов и сводка по моделям
+    """
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    min_train = config.LSTM_LOOK_BACK + max(config.RF_N_LAGS, 30) + horizon
+
+    tasks = []
+    for ticker in tickers:
+        data = load_fixture(fixtures_dir, ticker)
+        prices = data['price'].to_numpy()
+        for fold, origin in enumerate(fold_origins(len(data), n_folds, horizon, min_train)):
+            for model_name in model_names:
+                tasks.append((
+                    model_name, ticker, fold,
+                    data.iloc[:origin], prices[origin:origin + horizon],
+                    n_threads, predict_repeats, overrides
+                ))
+
+    print(f"Прогонов: {len(tasks)}, процессов: {workers}, потоков на прогон: {n_threads}")
+
+    started = time.perf_counter()
+    records = []
+    # Новый процесс на каждый прогон: пиковый RSS не накапливается между прогонами
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=1
+    ) as pool:
+        futures = [pool.submit(run_fold, *task) for task in tasks]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            status = f"RMSE={record['rmse']:.3f}" if record['ok'] else f"ошибка: {record['error']}"
+            print(f"  {record['model']:<14} {record['ticker']:<6} фолд {record['fold']}: {status}")
+
+    records.sort(key=lambda record: (record['ticker'], record['fold'], model_names.index(record['model'])))
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': workers,
+            'threads_per_run': n_threads,
+            'tickers': tickers,
+            'models': model_names,
+            'folds': n_folds,
+            'horizon': horizon,
+            'predict_repeats': predict_repeats,
+            'overrides': {name: repr(value) for name, value in overrides.items()},
+            'wall_seconds': time.perf_counter() - started,
+        },
+        'summary': summarize(records),
+        'results': records,
+    }
+
+
+def print_summary(report: Dict[str, object]):
+    print(f"\n{'модель':<16}{'RMSE':>10}{'MAPE, %':>10}{'обучение, с':>14}{'predict, мс':>13}{'RSS, МБ':>10}{'ошибки':>8}")
+    for model_name, entry in report['summary'].items():
+        if 'rmse' not in entry:
+            print(f"{model_name:<16}{'—':>10}{'—':>10}{'—':>14}{'—':>13}{'—':>10}{entry['failures']:>8}")
+            continue
+        rss = f"{entry['peak_rss_mb']:.0f}" if entry['peak_rss_mb'] is not None else '—'
+        print(
+            f"{model_name:<16}{entry['rmse']:>10.3f}{entry['mape']:>10.2f}"
+            f"{entry['train_seconds']:>14.2f}{entry['predict_ms']:>13.2f}{rss:>10}{entry['failures']:>8}"
+        )
+    print(f"\nОбщее время: {report['meta']['wall_seconds']:.1f} с")
+
+
+def compare_reports(
+        baseline: Dict[str, object],
+        current: Dict[str, object],
+        tolerance: Dict[str, float] = None
+) -> List[str]:
+    """
+    Сравнение сводок двух отчетов
+
+    Returns:
+        Список регрессий (пустой, если все метрики в допуске)
+    """
+    tolerance = tolerance or DEFAULT_TOLERANCE
+    regressions = []
+
+    print(f"\n{'модель':<16}{'метрика':<16}{'было':>12}{'стало':>12}{'изменение':>12}")
+    for model_name, entry in current['summary'].items():
+        base = baseline['summary'].get(model_name)
+        if base is None:
+            continue
+        if entry['failures'] > base['failures']:
+            regressions.append(f"{model_name}: ошибок {base['failures']} -> {entry['failures']}")
+
+        for metric, allowed in tolerance.items():
+            old, new = base.get(metric), entry.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            flag = ' !' if change > allowed else ''
+            print(f"{model_name:<16}{metric:<16}{old:>12.3f}{new:>12.3f}{change:>+11.1%}{flag}")
+            if flag:
+                regressions.append(f"{model_name}: {metric} {old:.3f} -> {new:.3f} ({change:+.1%})")
+
+    return regressions
+
+
+def parse_overrides(items: List[str]) -> Dict[str, object]:
+    """Разбор параметров вида NAME=VALUE (значение — литерал Python)"""
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        if not hasattr(config, name):
+            raise SystemExit(f"Неизвестный параметр конфигурации: {name}")
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[name] = value
+    return overrides
+
+
+def main():
+    from models.registry import model_registry
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='каталог с CSV-фикстурами')
+    parser.add_argument('--tickers', nargs='+', help='тикеры (по умолчанию все фикстуры)')
+    parser.add_argument('--models', nargs='+', default=model_registry.names(), help='модели из реестра')
+    parser.add_argument('--folds', type=int, default=4, help='количество фолдов на тикер')
+    parser.add_argument('--horizon', type=int, default=config.FORECAST_DAYS, help='горизонт прогноза, дней')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='процессов')
+    parser.add_argument('--predict-repeats', type=int, default=5, help='повторов predict для замера задержки')
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='NAME=VALUE',
+                        help='переопределение параметра config (можно несколько раз)')
+    parser.add_argument('--output', help='файл для JSON-отчета')
+    parser.add_argument('--compare', help='JSON-отчет для сравнения; код возврата 1 при регрессии')
+    parser.add_argument('--make-fixtures', action='store_true', help='сгенерировать фикстуры и выйти')
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.fixtures)
+        return
+
+    overrides = parse_overrides(args.overrides)
+    _apply_overrides(overrides)
+
+    tickers = args.tickers or sorted(
+        name[:-len('.csv')] for name in os.listdir(args.fixtures) if name.endswith('.csv')
+    )
+    for model_name in args.models:
+        model_registry.get(model_name)
+
+    report = run_backtest(
+        args.fixtures,
+        tickers,
+        args.models,
+        args.folds,
+        args.horizon,
+        max(1, args.workers),
+        max(1, args.predict_repeats),
+        overrides
+    )
+    print_summary(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен в {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report)
+        if regressions:
+            print("\nРегрессии:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == '__main__':
+    main()
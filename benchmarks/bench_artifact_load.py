@@ -0,0 +1,110 @@
+"""
+Бенчмарк загрузки сохраненных моделей
+
+Обучает модели на фикстуре, сохраняет их в ArtifactStore и замеряет
+холодный старт в новом процессе: импорт библиотек, загрузку моделей
+с диска и первый прогноз. Для сравнения печатаются время обучения и
+загрузка того же сервиса из pickle
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_artifact_load
+    python -m benchmarks.bench_artifact_load --ticker VOLAT --repeats 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from benchmarks.backtest import FIXTURES_DIR, load_fixture
+from config import config
+
+
+def _directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def cold_load(directory: str, key: tuple) -> dict:
+    """Загрузка моделей в новом процессе (точка входа для spawn)"""
+    start = time.perf_counter()
+    from services.artifact_store import ArtifactStore
+    from models.registry import model_registry
+    # Модули моделей импортируются при создании, считаем их импортом библиотек
+    for name in config.ENABLED_MODELS:
+        model_registry.create(name)
+    imported = time.perf_counter()
+
+    store = ArtifactStore(directory=directory, enabled=True)
+    service = store.load(key)
+    loaded = time.perf_counter()
+
+    service.predict(config.FORECAST_DAYS)
+    predicted = time.perf_counter()
+
+    return {
+        'import': imported - start,
+        'load': loaded - imported,
+        'predict': predicted - loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки сохраненных моделей')
+    parser.add_argument('--ticker', default='TREND', help='фикстура из benchmarks/fixtures')
+    parser.add_argument('--repeats', type=int, default=3, help='запусков холодного старта')
+    args = parser.parse_args()
+
+    from services.artifact_store import ArtifactStore
+    from services.model_cache import ModelCache
+    from services.prediction_service import PredictionService
+
+    data = load_fixture(FIXTURES_DIR, args.ticker)
+    key = ModelCache.make_key(args.ticker, data)
+
+    start = time.perf_counter()
+    service = PredictionService()
+    service.train_all_models(data)
+    train_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ArtifactStore(directory=directory, enabled=True)
+        start = time.perf_counter()
+        store.save(key, service)
+        save_seconds = time.perf_counter() - start
+        artifact_bytes = _directory_size(directory)
+
+        blob = pickle.dumps(service, protocol=pickle.HIGHEST_PROTOCOL)
+        start = time.perf_counter()
+        pickle.loads(blob)
+        unpickle_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm = store.load(key)
+        warm_seconds = time.perf_counter() - start
+
+        expected = service.predict(config.FORECAST_DAYS)
+        loaded = warm.predict(config.FORECAST_DAYS)
+        max_diff = float(abs(expected - loaded).max())
+
+        context = multiprocessing.get_context('spawn')
+        runs = []
+        for _ in range(args.repeats):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(cold_load, (directory, key)))
+
+    print(f"{args.ticker}: {len(data)} свечей, модели: {', '.join(service.models)}")
+    print(f"обучение:              {train_seconds:8.3f} с")
+    print(f"сохранение:            {save_seconds:8.3f} с ({artifact_bytes / 1024:.0f} КБ)")
+    print(f"pickle.loads:          {unpickle_seconds:8.3f} с ({len(blob) / 1024:.0f} КБ)")
+    print(f"загрузка (прогретый):  {warm_seconds:8.3f} с, расхождение прогноза {max_diff:.2e}")
+    print("холодный старт (лучший из запусков):")
+    for stage, title in (('import', 'импорт библиотек'), ('load', 'загрузка моделей'), ('predict', 'первый прогноз')):
+        print(f"  {title:<20} {min(run[stage] for run in runs):8.3f} с")
+
+
+if __name__ == '__main__':
+    main()
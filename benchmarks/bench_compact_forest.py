@@ -0,0 +1,94 @@
+"""
+Бенчмарк CompactForest
+
+Сравнивает деревья sklearn и CompactForest (полный, обрезанный по
+глубине, с отбором деревьев) на одном обученном лесе: объем в кэше
+моделей (pickle), время прогноза на FORECAST_DAYS шагов, время пакетного
+прогноза тестовой выборки, расхождение с sklearn и RMSE
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_compact_forest
+    python -m benchmarks.bench_compact_forest --ticker VOLAT
+"""
+
+import argparse
+import copy
+import pickle
+import time
+import numpy as np
+from sklearn.metrics import root_mean_squared_error
+from benchmarks.backtest import FIXTURES_DIR, load_fixture
+from models.compact_forest import CompactForest
+from models.random_forest import RandomForestModel
+from config import config
+
+REPEATS = 20
+
+# Вариант: (название, обрезка по глубине, деревьев после отбора)
+VARIANTS = [
+    ('CompactForest', None, 0),
+    ('глубина 8', 8, 0),
+    ('30 деревьев', None, 30),
+    ('20 деревьев, глубина 6', 6, 20),
+]
+
+
+def best_time(func, *args) -> float:
+    """Лучшее время из REPEATS запусков, мс"""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк CompactForest')
+    parser.add_argument('--ticker', default='TREND', help='фикстура из benchmarks/fixtures')
+    args = parser.parse_args()
+
+    data = load_fixture(FIXTURES_DIR, args.ticker)
+
+    # Обучаем лес sklearn, компактные варианты строятся из него
+    config.RF_COMPACT = False
+    reference = RandomForestModel()
+    reference.set_cpu_budget(1)
+    reference.train(data, train_size=config.TRAIN_SIZE)
+
+    df = reference.create_lag_features(data)
+    split_idx = int(len(df) * config.TRAIN_SIZE)
+    X = df.drop(columns='price').values
+    X_train, X_test = X[:split_idx], X[split_idx:]
+    y_test = df['price'].values[split_idx:]
+    expected = reference.model.predict(X_test)
+
+    models = [('sklearn', reference)]
+    for name, max_depth, n_trees in VARIANTS:
+        forest = CompactForest.from_estimator(reference.model, max_depth=max_depth)
+        if n_trees:
+            forest = forest.select(X_train, n_trees)
+        model = copy.copy(reference)
+        model.model = forest
+        models.append((name, model))
+
+    print(f"{args.ticker}: {len(data)} свечей, деревьев: {config.RF_N_ESTIMATORS}, глубина: {config.RF_MAX_DEPTH}")
+    print(
+        f"{'вариант':<26}{'КБ':>8}{'прогноз, мс':>13}{'пакет, мс':>11}"
+        f"{'отклонение':>12}{'RMSE':>9}"
+    )
+    for name, model in models:
+        size_kb = len(pickle.dumps(model.model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024
+        forecast_ms = best_time(model.predict, config.FORECAST_DAYS)
+        batch_ms = best_time(model.model.predict, X_test)
+        predictions = model.model.predict(X_test)
+        max_diff = float(np.abs(predictions - expected).max())
+        rmse = root_mean_squared_error(y_test, predictions)
+        print(
+            f"{name:<26}{size_kb:>8.0f}{forecast_ms:>13.2f}{batch_ms:>11.2f}"
+            f"{max_diff:>12.2e}{rmse:>9.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
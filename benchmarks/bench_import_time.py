@@ -0,0 +1,72 @@
+"""
+Бенчмарк времени импорта модулей
+
+Каждый модуль импортируется в отдельном процессе с `python -X importtime`,
+чтобы замеры не зависели от уже загруженных библиотек. Отдельно показывается,
+какие тяжелые библиотеки подтягивает импорт main (старт бота)
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_import_time
+"""
+
+import subprocess
+import sys
+
+MODULES = (
+    'main',
+    'bot.handlers',
+    'services.data_service',
+    'services.model_cache',
+    'services.prediction_service',
+    'services.visualization_service',
+    'models.random_forest',
+    'models.arima_model',
+    'models.lstm_model',
+    'utils.trading_signals',
+)
+
+HEAVY_LIBRARIES = ('torch', 'statsmodels', 'sklearn', 'scipy', 'matplotlib', 'pandas', 'yfinance')
+
+
+def measure_import(module_name: str) -> dict:
+    """
+    Импорт модуля в чистом процессе
+
+    Returns:
+        Словарь с общим временем импорта (мс) и временем загрузки тяжелых библиотек
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # Строки вида "import time:   self |  cumulative | name" (мкс)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        cumulative[name] = int(cumulative_us)
+
+    return {
+        'total_ms': cumulative.get(module_name, 0) / 1000,
+        'heavy': {
+            library: cumulative[library] / 1000
+            for library in HEAVY_LIBRARIES if library in cumulative
+        }
+    }
+
+
+def main():
+    print(f"{'модуль':<34}{'импорт, мс':>12}  тяжелые библиотеки, мс")
+    for module_name in MODULES:
+        stats = measure_import(module_name)
+        heavy = ', '.join(f'{name} {ms:.0f}' for name, ms in stats['heavy'].items()) or '—'
+        print(f"{module_name:<34}{stats['total_ms']:>12.0f}  {heavy}")
+
+
+if __name__ == '__main__':
+    main()
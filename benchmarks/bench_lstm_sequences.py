@@ -0,0 +1,69 @@
+"""
+Бенчмарк построения последовательностей для LSTM
+
+Сравнивает исходный цикл на Python с векторизованными
+LSTMModel.prepare_sequences (NumPy) и LSTMModel.prepare_tensors (torch)
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_lstm_sequences
+"""
+
+import time
+import numpy as np
+from models.lstm_model import LSTMModel
+
+# Длины рядов: дневные свечи за 2 и 10 лет, минутные свечи за месяц и год
+SERIES = {
+    'daily 2y': 504,
+    'daily 10y': 2520,
+    'intraday 1m': 21 * 390,
+    'intraday 1y': 252 * 390,
+}
+REPEATS = 5
+
+
+def legacy_prepare_sequences(data: np.ndarray, look_back: int) -> tuple:
+    """Исходная реализация с циклом"""
+    X, y = [], []
+    for i in range(look_back, len(data)):
+        X.append(data[i-look_back:i])
+        y.append(data[i])
+    return np.array(X), np.array(y)
+
+
+def best_time(func, *args) -> float:
+    """Лучшее время из REPEATS запусков, мс"""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    model = LSTMModel()
+    rng = np.random.default_rng(42)
+
+    print(f"look_back = {model.look_back}")
+    print(f"{'ряд':<14}{'точек':>8}{'цикл, мс':>12}{'numpy, мс':>12}{'torch, мс':>12}{'ускорение':>12}")
+
+    for name, length in SERIES.items():
+        data = rng.standard_normal((length, 1))
+
+        X_old, y_old = legacy_prepare_sequences(data, model.look_back)
+        X_new, y_new = model.prepare_sequences(data)
+        assert np.allclose(X_old, X_new, atol=1e-6) and np.allclose(y_old, y_new, atol=1e-6)
+
+        legacy_ms = best_time(legacy_prepare_sequences, data, model.look_back)
+        numpy_ms = best_time(model.prepare_sequences, data)
+        torch_ms = best_time(model.prepare_tensors, data)
+
+        print(
+            f"{name:<14}{length:>8}{legacy_ms:>12.2f}{numpy_ms:>12.3f}"
+            f"{torch_ms:>12.3f}{legacy_ms / numpy_ms:>11.0f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Бенчмарк цикла обучения LSTM на CPU
+
+Сравнивает исходный цикл с DataLoader и LSTMModel.fit в разных режимах:
+срезы тензоров, bfloat16, ранняя остановка, torch.compile и число
+потоков. Для каждого режима печатаются эпохи в секунду и итоговый RMSE
+на тестовой части фикстуры
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_lstm_training
+    python -m benchmarks.bench_lstm_training --ticker VOLAT --epochs 100 --compile
+"""
+
+import argparse
+import os
+import time
+from typing import Optional
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, TensorDataset
+from benchmarks.backtest import FIXTURES_DIR, load_fixture
+from models.lstm_model import LSTMModel
+from config import config
+
+SEED = 42
+
+
+class LegacyLSTMModel(LSTMModel):
+    """Исходный цикл обучения: DataLoader, float32, фиксированное число эпох"""
+
+    def fit(self, X_train: torch.Tensor, y_train: torch.Tensor, deadline: Optional[float] = None):
+        train_loader = DataLoader(
+            TensorDataset(X_train, y_train),
+            batch_size=config.LSTM_BATCH_SIZE,
+            shuffle=False
+        )
+        criterion = nn.MSELoss()
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.001)
+
+        self.model.train()
+        for epoch in range(config.LSTM_EPOCHS):
+            for batch_X, batch_y in train_loader:
+                optimizer.zero_grad()
+                outputs = self.model(batch_X)
+                loss = criterion(outputs, batch_y)
+                loss.backward()
+                optimizer.step()
+        self.epochs_trained = config.LSTM_EPOCHS
+
+
+def run_mode(model_class, data, threads: int, **overrides) -> dict:
+    """Обучение с переопределенными параметрами конфигурации"""
+    original = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    try:
+        torch.manual_seed(SEED)
+        model = model_class()
+        model.set_cpu_budget(threads)
+
+        start = time.perf_counter()
+        rmse = model.train(data)
+        elapsed = time.perf_counter() - start
+    finally:
+        for name, value in original.items():
+            setattr(config, name, value)
+
+    return {
+        'epochs': model.epochs_trained,
+        'seconds': elapsed,
+        'epochs_per_sec': model.epochs_trained / elapsed,
+        'rmse': rmse,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк цикла обучения LSTM')
+    parser.add_argument('--ticker', default='TREND', help='фикстура из benchmarks/fixtures')
+    parser.add_argument('--epochs', type=int, default=config.LSTM_EPOCHS)
+    parser.add_argument('--patience', type=int, default=5, help='терпение для режима с ранней остановкой')
+    parser.add_argument('--compile', action='store_true', help='добавить режим с torch.compile')
+    args = parser.parse_args()
+
+    data = load_fixture(FIXTURES_DIR, args.ticker)
+    cpu_count = os.cpu_count() or 1
+    thread_counts = sorted({1, min(2, cpu_count), min(4, cpu_count), cpu_count})
+
+    modes = [
+        ('DataLoader (исходный)', LegacyLSTMModel, {}),
+        ('срезы тензоров', LSTMModel, {}),
+        ('срезы + bf16', LSTMModel, {'LSTM_BF16': True}),
+        (f'ранняя остановка ({args.patience})', LSTMModel, {'LSTM_EARLY_STOPPING_PATIENCE': args.patience}),
+    ]
+    if args.compile:
+        modes.append(('torch.compile', LSTMModel, {'LSTM_COMPILE': True}))
+
+    print(f"{args.ticker}: {len(data)} свечей, эпох: {args.epochs}, ядер: {cpu_count}")
+    print(f"{'режим':<28}{'потоков':>8}{'эпох':>6}{'время, с':>10}{'эпох/с':>9}{'RMSE':>9}")
+
+    for threads in thread_counts:
+        for name, model_class, overrides in modes:
+            result = run_mode(
+                model_class, data, threads,
+                LSTM_EPOCHS=args.epochs, LSTM_NUM_THREADS=0, **overrides
+            )
+            print(
+                f"{name:<28}{threads:>8}{result['epochs']:>6}{result['seconds']:>10.2f}"
+                f"{result['epochs_per_sec']:>9.2f}{result['rmse']:>9.3f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Бенчмарк параллельного обучения моделей
+
+Сравнивает обучение всех моделей одного тикера через AnalysisExecutor:
+последовательно в одном воркере, вложенным пулом spawn-процессов внутри
+воркера (прежняя схема, пул создается заново при каждом обучении) и
+раздачей групп моделей по воркерам общего пула (AnalysisService._train).
+По умолчанию воркеров столько же, сколько в config.ANALYSIS_PROCESS_WORKERS.
+Первый запуск каждого режима прогревает пул и не учитывается. При
+--check скрипт завершается с кодом 1, если раздача по воркерам
+медленнее вложенного пула больше чем на --tolerance
+
+Модели делятся на группы по числу воркеров, но не больше бюджета ядер:
+по умолчанию бюджет равен числу ядер (os.cpu_count())
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_parallel_training
+    python -m benchmarks.bench_parallel_training --ticker VOLAT --repeats 5 --check
+    python -m benchmarks.bench_parallel_training --cpu-budget 3 --workers 3
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.backtest import FIXTURES_DIR, load_fixture
+from config import config
+
+
+def nested_pool_training(data, cpu_budget: int):
+    """Прежняя схема: новый spawn-пул на модель внутри воркера (точка входа для пула процессов)"""
+    from services.prediction_service import PredictionService, get_deadline, train_model
+
+    service = PredictionService()
+    n_threads = max(1, cpu_budget // len(service.models))
+    deadline = get_deadline()
+    with ProcessPoolExecutor(
+            max_workers=len(service.models),
+            mp_context=multiprocessing.get_context('spawn')
+    ) as pool:
+        futures = {
+            name: pool.submit(train_model, model, data, config.TRAIN_SIZE, n_threads, False, deadline)
+            for name, model in service.models.items()
+        }
+        service.apply_trained({name: future.result() for name, future in futures.items()})
+    return service
+
+
+async def run_modes(data, cpu_budget: int, repeats: int) -> dict:
+    from services.analysis_executor import analysis_executor
+    from services.analysis_service import AnalysisService
+    from services.prediction_service import train_prediction_service
+
+    modes = {
+        'последовательно': lambda: analysis_executor.run_cpu(
+            train_prediction_service, data, None, None, None, cpu_budget
+        ),
+        'вложенный пул': lambda: analysis_executor.run_cpu(nested_pool_training, data, cpu_budget),
+        'общий пул': lambda: AnalysisService._train(data, None, None, None, cpu_budget),
+    }
+
+    timings = {}
+    for name, run in modes.items():
+        # Прогрев: запуск воркеров и импорт библиотек
+        service = await run()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            service = await run()
+            times.append(time.perf_counter() - start)
+        timings[name] = (times, service)
+
+    analysis_executor.shutdown()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк параллельного обучения моделей')
+    parser.add_argument('--ticker', default='TREND', help='фикстура из benchmarks/fixtures')
+    parser.add_argument('--repeats', type=int, default=3, help='замеров на режим')
+    parser.add_argument('--cpu-budget', type=int, default=os.cpu_count() or 1, help='ядер на обучение')
+    parser.add_argument('--workers', type=int, default=config.ANALYSIS_PROCESS_WORKERS, help='воркеров пула')
+    parser.add_argument('--check', action='store_true', help='код 1 при замедлении общего пула')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='допустимое замедление (доля)')
+    args = parser.parse_args()
+
+    # Пул исполнителя создается при импорте analysis_executor, после этой настройки
+    config.ANALYSIS_PROCESS_WORKERS = args.workers
+    config.PARALLEL_TRAINING = True
+
+    data = load_fixture(FIXTURES_DIR, args.ticker)
+    timings = asyncio.run(run_modes(data, args.cpu_budget, args.repeats))
+
+    print(
+        f"{args.ticker}: {len(data)} свечей, моделей: {len(config.ENABLED_MODELS)}, "
+        f"ядер: {os.cpu_count()}, бюджет: {args.cpu_budget}, воркеров: {args.workers}"
+    )
+    print(f"{'режим':<18}{'медиана, с':>12}{'лучшее, с':>11}  лучшая модель")
+    for name, (times, service) in timings.items():
+        print(
+            f"{name:<18}{statistics.median(times):>12.3f}{min(times):>11.3f}  "
+            f"{service.best_model_name} (RMSE={service.best_rmse:.3f})"
+        )
+
+    nested = statistics.median(timings['вложенный пул'][0])
+    shared = statistics.median(timings['общий пул'][0])
+    print(f"общий пул против вложенного: {nested / shared:.2f}x")
+    if args.check and shared > nested * (1 + args.tolerance):
+        print("РЕГРЕССИЯ: общий пул медленнее вложенного")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк обучения с ограничением по времени
+
+Обучает каждую модель на фикстурах без deadline и с deadline из
+config.TRAINING_DEADLINE и сравнивает время, выполненные шаги обучения
+(эпохи, деревья, итерации) и RMSE. При достаточном запасе времени
+deadline не должен замедлять обучение или менять результат: при
+расхождении шагов или RMSE, а также при замедлении больше чем на
+--tolerance скрипт завершается с кодом 1
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_training_deadline
+    python -m benchmarks.bench_training_deadline --models ARIMA "Random Forest"
+"""
+
+import argparse
+import math
+import sys
+import time
+import torch
+from benchmarks.backtest import FIXTURES_DIR, load_fixture
+from models.registry import model_registry
+from config import config
+
+TICKERS = ('TREND', 'RANGE', 'VOLAT')
+SEED = 42
+
+
+def train(model_name: str, data, deadline_seconds: float) -> dict:
+    """Обучение модели без deadline (0) или с deadline через deadline_seconds"""
+    torch.manual_seed(SEED)
+    model = model_registry.create(model_name)
+    model.set_cpu_budget(1)
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds > 0 else None
+    rmse = model.train(data, train_size=config.TRAIN_SIZE, deadline=deadline)
+    return {
+        'seconds': time.perf_counter() - start,
+        'rmse': rmse,
+        'used': model.budget_used.get('used'),
+        'stopped': model.budget_used.get('stopped'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк обучения с deadline')
+    parser.add_argument('--models', nargs='+', default=list(config.ENABLED_MODELS))
+    parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое замедление (доля)')
+    args = parser.parse_args()
+
+    deadline_seconds = config.TRAINING_DEADLINE
+    print(f"deadline: {deadline_seconds:g} с")
+    print(
+        f"{'модель':<15}{'тикер':<7}{'без, с':>8}{'с deadline, с':>15}"
+        f"{'шаги':>11}{'остановка':>11}{'RMSE':>9}"
+    )
+
+    failures = []
+    for model_name in args.models:
+        for ticker in TICKERS:
+            data = load_fixture(FIXTURES_DIR, ticker)
+            # Прогрев импортов и кэшей, чтобы первый замер не был медленнее
+            train(model_name, data, 0)
+            baseline = train(model_name, data, 0)
+            bounded = train(model_name, data, deadline_seconds)
+
+            print(
+                f"{model_name:<15}{ticker:<7}{baseline['seconds']:>8.3f}{bounded['seconds']:>15.3f}"
+                f"{baseline['used']:>5}->{bounded['used']:<5}{bounded['stopped']:>11}{bounded['rmse']:>9.3f}"
+            )
+
+            if bounded['used'] != baseline['used'] or not math.isclose(bounded['rmse'], baseline['rmse'], rel_tol=1e-9):
+                failures.append(f"{model_name}/{ticker}: результат обучения отличается")
+            if bounded['seconds'] > baseline['seconds'] * (1 + args.tolerance):
+                failures.append(f"{model_name}/{ticker}: замедление {bounded['seconds'] / baseline['seconds']:.2f}x")
+
+    for failure in failures:
+        print(f"РЕГРЕССИЯ: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,15 @@
 Обработчики Telegram бота
 """
 
-import os
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
-from services.data_service import DataService
-from services.prediction_service import PredictionService
-from services.visualization_service import VisualizationService
-from utils.trading_signals import TradingSignals
-from utils.logger import log_user_request
+from services.analysis_executor import analysis_executor
+from services.stats_service import StatsService
+from utils.logger import log_user_request, request_log
+from utils.metrics import request_trace, span
+from utils.tickers import validate_ticker
+from utils.warmup import import_modules
 from config import config
 
 logger = logging.getLogger(__name__)
@@ -19,6 +19,17 @@ logger = logging.getLogger(__name__)
 TICKER, AMOUNT = range(2)
 
 
+async def ensure_analysis_modules():
+    """
+    Загрузка модулей анализа в пуле потоков
+
+    Тяжелые библиотеки (torch, statsmodels, sklearn, matplotlib) импортируются
+    при первом запросе или фоновым прогревом, а не при старте бота, и
+    их загрузка не блокирует event loop
+    """
+    await analysis_executor.run_io(import_modules)
+
+
 class BotHandlers:
     """Класс с обработчиками бота"""
 
@@ -45,7 +56,7 @@ class BotHandlers:
         ticker = update.message.text.strip().upper()
 
         # Валидация тикера
-        if not DataService.validate_ticker(ticker):
+        if not validate_ticker(ticker):
             await update.message.reply_text(
                 "❌ Некорректный тикер. Пожалуйста, введите валидный тикер "
                 "(например, AAPL, MSFT, GOOGL):"
@@ -83,129 +94,140 @@ class BotHandlers:
             context.user_data['amount'] = amount
             ticker = context.user_data['ticker']
 
-            # Уведомление о начале анализа
-            await update.message.reply_text(
-                f"💼 <b>Начинаю анализ акций {ticker}</b>\n\n"
-                "⏳ Загружаю данные за последние 2 года...\n"
-                "🤖 Обучаю модели машинного обучения...\n"
-                "📈 Строю прогноз...\n\n"
-                "⏱ Это займет 1-2 минуты, пожалуйста, подождите...",
-                parse_mode='HTML'
-            )
+            await ensure_analysis_modules()
+            from services.analysis_service import analysis_service
+            from utils.trading_signals import TradingSignals
+
+            # Разбивка времени запроса по этапам (при METRICS_ENABLED)
+            with request_trace(f'{update.effective_user.id}:{ticker}'), span('analysis_total'):
+                # Одновременные запросы одного тикера ждут общий анализ
+                position = analysis_executor.queue_position()
+                flight = analysis_service.submit(ticker)
 
-            # Загрузка данных
-            data_service = DataService()
-            data = data_service.load_stock_data(ticker)
+                # Уведомление о месте в очереди
+                if position > 0 and not flight.started.is_set():
+                    await update.message.reply_text(
+                        f"🕐 Сейчас выполняются другие анализы.\n"
+                        f"Вы <b>№{position}</b> в очереди, анализ начнется автоматически.",
+                        parse_mode='HTML'
+                    )
 
-            if data is None:
+                await flight.started.wait()
+
+                # Уведомление о начале анализа
                 await update.message.reply_text(
-                    f"❌ <b>Ошибка загрузки данных</b>\n\n"
-                    f"Не удалось загрузить данные для тикера <b>{ticker}</b>.\n"
-                    "Возможные причины:\n"
-                    "• Неверный тикер\n"
-                    "• Проблемы с подключением к Yahoo Finance\n"
-                    "• Тикер не торгуется на бирже\n\n"
-                    "Используйте /start для новой попытки.",
+                    f"💼 <b>Начинаю анализ акций {ticker}</b>\n\n"
+                    "⏳ Загружаю данные за последние 2 года...\n"
+                    "🤖 Обучаю модели машинного обучения...\n"
+                    "📈 Строю прогноз...\n\n"
+                    "⏱ Это займет 1-2 минуты, пожалуйста, подождите...",
                     parse_mode='HTML'
                 )
-                return ConversationHandler.END
-
-            # Обучение моделей
-            prediction_service = PredictionService()
-            prediction_service.train_all_models(data)
 
-            # Прогнозирование
-            predictions = prediction_service.predict(steps=config.FORECAST_DAYS)
+                analysis = await flight.result()
+
+                if analysis is None:
+                    await update.message.reply_text(
+                        f"❌ <b>Ошибка загрузки данных</b>\n\n"
+                        f"Не удалось загрузить данные для тикера <b>{ticker}</b>.\n"
+                        "Возможные причины:\n"
+                        "• Неверный тикер\n"
+                        "• Проблемы с подключением к Yahoo Finance\n"
+                        "• Тикер не торгуется на бирже\n\n"
+                        "Используйте /start для новой попытки.",
+                        parse_mode='HTML'
+                    )
+                    return ConversationHandler.END
+
+                data = analysis.data
+                predictions = analysis.predictions
+                results = analysis.results
+
+                # Прибыль зависит от суммы пользователя и считается для каждого запроса
+                profit, strategy = TradingSignals.calculate_profit(
+                    predictions, amount, analysis.buy_days, analysis.sell_days
+                )
 
-            # Определение торговых сигналов
-            trading_signals = TradingSignals()
-            buy_days, sell_days = trading_signals.find_extrema(predictions)
-            profit, strategy = trading_signals.calculate_profit(
-                predictions, amount, buy_days, sell_days
-            )
+                # Отправка графика
+                with span('telegram_upload'):
+                    await update.message.reply_photo(photo=analysis.chart)
 
-            # Создание графика
-            viz_service = VisualizationService()
-            chart_file = viz_service.plot_prediction(
-                ticker, data, predictions, buy_days, sell_days
-            )
+                # Формирование отчета
+                current_price = data['price'].iloc[-1]
+                predicted_price = predictions[-1]
+                price_change = ((predicted_price - current_price) / current_price) * 100
 
-            # Отправка графика
-            with open(chart_file, 'rb') as photo:
-                await update.message.reply_photo(photo=photo)
+                # Эмодзи для изменения цены
+                trend_emoji = "📈" if price_change > 0 else "📉"
+                trend_text = "вырастет" if price_change > 0 else "упадет"
 
-            # Удаление временного файла
-            os.remove(chart_file)
+                report = (
+                    f"📊 <b>ОТЧЕТ ПО АКЦИЯМ {ticker}</b>\n"
+                    f"{'='*40}\n\n"
+                    f"🤖 <b>Модели машинного обучения:</b>\n"
+                )
 
-            # Формирование отчета
-            results = prediction_service.get_results_summary()
-            current_price = data['price'].iloc[-1]
-            predicted_price = predictions[-1]
-            price_change = ((predicted_price - current_price) / current_price) * 100
+                # Добавляем результаты всех моделей
+                for model_name, rmse in results['all_results'].items():
+                    if rmse == float('inf'):
+                        report += f"   • {model_name}: ❌ Ошибка обучения\n"
+                    else:
+                        best_mark = " ⭐" if model_name == results['best_model'] else ""
+                        elapsed = results['timings'].get(model_name, 0.0)
+                        report += (
+                            f"   • {model_name}: RMSE = {rmse:.2f}{best_mark} "
+                            f"(⏱ {elapsed:.1f} с)\n"
+                        )
+
+                for model_name, reason in results['skipped'].items():
+                    report += f"   • {model_name}: ⏭ пропущена ({reason})\n"
+
+                report += (
+                    f"\n🏆 <b>Лучшая модель:</b> {results['best_model']}\n"
+                    f"📏 <b>Точность (RMSE):</b> {results['best_rmse']:.2f}\n\n"
+                    f"{'='*40}\n"
+                    f"💵 <b>АНАЛИЗ ЦЕН:</b>\n"
+                    f"   • Текущая цена: <b>${current_price:.2f}</b>\n"
+                    f"   • Прогноз через {config.FORECAST_DAYS} дней: <b>${predicted_price:.2f}</b>\n"
+                    f"   • Изменение: {trend_emoji} <b>{abs(price_change):.2f}%</b> ({trend_text})\n\n"
+                    f"{'='*40}\n"
+                    f"💰 <b>ИНВЕСТИЦИОННАЯ СТРАТЕГИЯ:</b>\n"
+                    f"   • Сумма инвестиции: <b>${amount:,.2f}</b>\n"
+                    f"   • Потенциальная прибыль: <b>${profit:,.2f}</b>\n"
+                )
 
-            # Эмодзи для изменения цены
-            trend_emoji = "📈" if price_change > 0 else "📉"
-            trend_text = "вырастет" if price_change > 0 else "упадет"
+                if profit > 0:
+                    roi = (profit / amount) * 100
+                    report += f"   • ROI: <b>{roi:.2f}%</b>\n"
 
-            report = (
-                f"📊 <b>ОТЧЕТ ПО АКЦИЯМ {ticker}</b>\n"
-                f"{'='*40}\n\n"
-                f"🤖 <b>Модели машинного обучения:</b>\n"
-            )
+                report += f"\n{'='*40}\n📍 <b>ТОРГОВЫЕ РЕКОМЕНДАЦИИ:</b>\n\n"
 
-            # Добавляем результаты всех моделей
-            for model_name, rmse in results['all_results'].items():
-                if rmse == float('inf'):
-                    report += f"   • {model_name}: ❌ Ошибка обучения\n"
+                if strategy:
+                    report += strategy
                 else:
-                    best_mark = " ⭐" if model_name == results['best_model'] else ""
-                    report += f"   • {model_name}: RMSE = {rmse:.2f}{best_mark}\n"
-
-            report += (
-                f"\n🏆 <b>Лучшая модель:</b> {results['best_model']}\n"
-                f"📏 <b>Точность (RMSE):</b> {results['best_rmse']:.2f}\n\n"
-                f"{'='*40}\n"
-                f"💵 <b>АНАЛИЗ ЦЕН:</b>\n"
-                f"   • Текущая цена: <b>${current_price:.2f}</b>\n"
-                f"   • Прогноз через {config.FORECAST_DAYS} дней: <b>${predicted_price:.2f}</b>\n"
-                f"   • Изменение: {trend_emoji} <b>{abs(price_change):.2f}%</b> ({trend_text})\n\n"
-                f"{'='*40}\n"
-                f"💰 <b>ИНВЕСТИЦИОННАЯ СТРАТЕГИЯ:</b>\n"
-                f"   • Сумма инвестиции: <b>${amount:,.2f}</b>\n"
-                f"   • Потенциальная прибыль: <b>${profit:,.2f}</b>\n"
-            )
-
-            if profit > 0:
-                roi = (profit / amount) * 100
-                report += f"   • ROI: <b>{roi:.2f}%</b>\n"
-
-            report += f"\n{'='*40}\n📍 <b>ТОРГОВЫЕ РЕКОМЕНДАЦИИ:</b>\n\n"
-
-            if strategy:
-                report += strategy
-            else:
-                report += "⚠️ Недостаточно четких сигналов для торговли"
-
-            report += (
-                f"\n\n{'='*40}\n"
-                "⚠️ <b>Важное предупреждение:</b>\n"
-                "Этот прогноз создан для образовательных целей. "
-                "Не используйте его как единственную основу для "
-                "инвестиционных решений.\n\n"
-                "Используйте /start для нового анализа."
-            )
-
-            await update.message.reply_text(report, parse_mode='HTML')
+                    report += "⚠️ Недостаточно четких сигналов для торговли"
+
+                report += (
+                    f"\n\n{'='*40}\n"
+                    "⚠️ <b>Важное предупреждение:</b>\n"
+                    "Этот прогноз создан для образовательных целей. "
+                    "Не используйте его как единственную основу для "
+                    "инвестиционных решений.\n\n"
+                    "Используйте /start для нового анализа."
+                )
 
-            # Логирование запроса
-            log_user_request(
-                user_id=update.effective_user.id,
-                ticker=ticker,
-                amount=amount,
-                model=results['best_model'],
-                metric=results['best_rmse'],
-                profit=profit
-            )
+                with span('telegram_report'):
+                    await update.message.reply_text(report, parse_mode='HTML')
+
+                # Логирование запроса
+                log_user_request(
+                    user_id=update.effective_user.id,
+                    ticker=ticker,
+                    amount=amount,
+                    model=results['best_model'],
+                    metric=results['best_rmse'],
+                    profit=profit
+                )
 
             logger.info(
                 f"Успешный анализ для пользователя {update.effective_user.id}: "
@@ -234,6 +256,117 @@ class BotHandlers:
 
         return ConversationHandler.END
 
+    @staticmethod
+    async def batch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Пакетный анализ: /batch AAPL MSFT TSLA 10000"""
+        usage = (
+            "Использование: <code>/batch AAPL MSFT TSLA 10000</code>\n"
+            f"До {config.BATCH_MAX_TICKERS} тикеров и сумма инвестиции в каждый из них."
+        )
+
+        args = context.args or []
+        try:
+            amount = float(args[-1].replace(',', '')) if args else 0.0
+        except ValueError:
+            amount = 0.0
+        tickers = list(dict.fromkeys(arg.strip().upper() for arg in args[:-1]))
+
+        if not tickers or not 0 < amount <= 1000000000:
+            await update.message.reply_text(usage, parse_mode='HTML')
+            return
+
+        if len(tickers) > config.BATCH_MAX_TICKERS:
+            await update.message.reply_text(
+                f"❌ Слишком много тикеров: {len(tickers)}.\n\n{usage}",
+                parse_mode='HTML'
+            )
+            return
+
+        invalid = [ticker for ticker in tickers if not validate_ticker(ticker)]
+        if invalid:
+            await update.message.reply_text(
+                f"❌ Некорректные тикеры: {', '.join(invalid)}\n\n{usage}",
+                parse_mode='HTML'
+            )
+            return
+
+        await ensure_analysis_modules()
+        from services.analysis_service import analysis_service
+        from utils.trading_signals import TradingSignals
+
+        try:
+            with request_trace(f'{update.effective_user.id}:batch'), span('batch_total'):
+                await update.message.reply_text(
+                    f"💼 <b>Начинаю пакетный анализ: {', '.join(tickers)}</b>\n\n"
+                    "⏱ Это займет несколько минут, пожалуйста, подождите...",
+                    parse_mode='HTML'
+                )
+
+                batch = await analysis_service.analyze_batch(tickers)
+
+                if batch.chart is not None:
+                    with span('telegram_upload'):
+                        await update.message.reply_photo(photo=batch.chart)
+
+                # Сравнительная таблица (моноширинный шрифт)
+                rows = [f"{'Тикер':<6}{'Цена':>9}{'Прогноз':>9}{'Изм.':>8}{'Прибыль':>10}"]
+                best_models = []
+                for ticker, analysis in batch.results.items():
+                    results = analysis.results
+
+                    profit, _ = TradingSignals.calculate_profit(
+                        analysis.predictions, amount, analysis.buy_days, analysis.sell_days
+                    )
+                    current_price = analysis.data['price'].iloc[-1]
+                    predicted_price = analysis.predictions[-1]
+                    price_change = ((predicted_price - current_price) / current_price) * 100
+
+                    rows.append(
+                        f"{ticker:<6}{current_price:>9.2f}{predicted_price:>9.2f}"
+                        f"{price_change:>+7.1f}%{profit:>10.2f}"
+                    )
+                    best_models.append(
+                        f"   • {ticker}: {results['best_model']} (RMSE = {results['best_rmse']:.2f})"
+                    )
+
+                    log_user_request(
+                        user_id=update.effective_user.id,
+                        ticker=ticker,
+                        amount=amount,
+                        model=results['best_model'],
+                        metric=results['best_rmse'],
+                        profit=profit
+                    )
+
+                report = (
+                    f"📊 <b>СРАВНЕНИЕ ПРОГНОЗОВ НА {config.FORECAST_DAYS} ДНЕЙ</b>\n"
+                    f"💵 Сумма инвестиции в каждый тикер: <b>${amount:,.2f}</b>\n\n"
+                )
+                if batch.results:
+                    report += "<pre>" + "\n".join(rows) + "</pre>\n\n"
+                    report += "🏆 <b>Лучшие модели:</b>\n" + "\n".join(best_models) + "\n"
+                for ticker in batch.missing:
+                    report += f"\n❌ {ticker}: не удалось загрузить данные"
+                for ticker in batch.errors:
+                    report += f"\n❌ {ticker}: ошибка анализа"
+
+                report += (
+                    "\n\n⚠️ Прогноз создан для образовательных целей. "
+                    "Подробный отчет по тикеру: /start"
+                )
+
+                with span('telegram_report'):
+                    await update.message.reply_text(report, parse_mode='HTML')
+
+        except Exception as e:
+            logger.error(f"Ошибка пакетного анализа: {e}", exc_info=True)
+            await update.message.reply_text(
+                f"❌ <b>Произошла ошибка</b>\n\n"
+                f"Детали: {str(e)}\n\n"
+                "Повторите попытку через минуту.",
+                parse_mode='HTML'
+            )
+
     @staticmethod
     async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Отмена диалога"""
@@ -243,6 +376,60 @@ class BotHandlers:
         )
         return ConversationHandler.END
 
+    @staticmethod
+    async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Статистика запросов (только для администраторов)"""
+        if update.effective_user.id not in config.ADMIN_IDS:
+            await update.message.reply_text("❌ Команда доступна только администраторам.")
+            return
+
+        await analysis_executor.run_io(request_log.flush)
+        stats = await analysis_executor.run_io(StatsService.compute)
+
+        if stats.total == 0:
+            await update.message.reply_text("📊 Журнал запросов пуст.")
+            return
+
+        report = (
+            f"📊 <b>СТАТИСТИКА ЗАПРОСОВ</b>\n\n"
+            f"Всего запросов: <b>{stats.total}</b>\n\n"
+            f"🔥 <b>Популярные тикеры:</b>\n"
+        )
+        for ticker, count in stats.ticker_counts.most_common(config.STATS_HOT_TICKERS):
+            report += f"   • {ticker}: {count}\n"
+
+        report += "\n🏆 <b>Победы моделей:</b>\n"
+        for model, rate in stats.win_rates().items():
+            report += f"   • {model}: {rate * 100:.1f}%\n"
+
+        if stats.rmse_count > 0:
+            report += (
+                f"\n📏 <b>RMSE:</b>\n"
+                f"   • Среднее: {stats.rmse_mean:.2f} ± {stats.rmse_std:.2f}\n"
+                f"   • Медиана: {stats.rmse_quantile(0.5):.2f}\n"
+                f"   • p90 / p99: {stats.rmse_quantile(0.9):.2f} / {stats.rmse_quantile(0.99):.2f}\n"
+                f"   • Мин / макс: {stats.rmse_min:.2f} / {stats.rmse_max:.2f}\n"
+            )
+
+        report += "\n👤 <b>Активные пользователи:</b>\n"
+        for user_id, count in stats.users.most_common(5):
+            report += f"   • {user_id}: {count}\n"
+
+        # Кэшу моделей нужен только pandas, модули анализа не загружаются
+        await analysis_executor.run_io(import_modules, ('services.model_cache',))
+        from services.model_cache import model_cache
+
+        metrics = analysis_executor.get_metrics()
+        cache_stats = model_cache.get_stats()
+        report += (
+            f"\n⚙️ <b>Сейчас:</b>\n"
+            f"   • Анализов: {metrics['active']}, в очереди: {metrics['queue_depth']}\n"
+            f"   • Кэш моделей: {cache_stats['entries']} записей, "
+            f"попаданий {cache_stats['hits']}, промахов {cache_stats['misses']}"
+        )
+
+        await update.message.reply_text(report, parse_mode='HTML')
+
     @staticmethod
     async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда помощи"""
@@ -251,7 +438,8 @@ class BotHandlers:
             "<b>Доступные команды:</b>\n"
             "/start - Начать анализ акций\n"
             "/help - Показать эту справку\n"
-            "/cancel - Отменить текущую операцию\n\n"
+            "/cancel - Отменить текущую операцию\n"
+            "/batch AAPL MSFT 10000 - Сравнить несколько тикеров\n\n"
             "<b>Как использовать бота:</b>\n"
             "1️⃣ Отправьте /start\n"
             "2️⃣ Введите тикер компании (например, AAPL)\n"
@@ -12,34 +12,114 @@ class Config:
 
     # Telegram
     BOT_TOKEN: str = 'YOUR_BOT_TOKEN'
+    ADMIN_IDS: tuple = ()  # ID пользователей с доступом к /stats
 
     # Параметры данных
     HISTORY_DAYS: int = 730  # 2 года
     FORECAST_DAYS: int = 30
 
+    # Торговая стратегия
+    TRADING_FEE: float = 0.0  # Комиссия с каждой покупки и продажи, доля суммы сделки
+    TRADING_SLIPPAGE: float = 0.0  # Проскальзывание цены исполнения, доля
+    SIGNAL_MIN_MOVE: float = 0.0  # Минимальное движение цены вокруг экстремума, доля
+
+    # Хранилище цен
+    PRICE_STORE_DIR: str = 'data/prices'
+    PRICE_SOURCE: str = 'yfinance'  # 'yfinance' или 'csv'
+    PRICE_SOURCE_DIR: str = 'benchmarks/fixtures'  # CSV-файлы {TICKER}.csv для PRICE_SOURCE='csv'
+    EXCHANGE_TIMEZONE: str = 'America/New_York'  # Свечи до текущей даты биржи считаются завершенными
+
     # Параметры обучения
     TRAIN_SIZE: float = 0.8
+    ENABLED_MODELS: tuple = ('Random Forest', 'ARIMA', 'LSTM')
+    MODEL_SKIP_MIN_COST: float = 5.0  # Модели не дешевле этого можно пропускать
+    MODEL_SKIP_WIN_RATE: float = 0.8  # ...если дешевая модель побеждает так часто
+    MODEL_SKIP_MIN_REQUESTS: int = 5  # ...на стольких полных обучениях по тикеру
+    MODEL_SKIP_DECAY: float = 0.9  # Вес прошлых обучений при каждом новом
+    MODEL_SKIP_RECHECK_EVERY: int = 10  # Каждое N-е обучение с пропуском выполняется полностью
+    MODEL_COST_BUDGET: float = 0.0  # Суммарная стоимость моделей (0 — без ограничения)
+    PARALLEL_TRAINING: bool = True  # Обучать модели в отдельных процессах
+    TRAINING_CPU_BUDGET: int = 0  # Ядер на один анализ (0 — поровну между воркерами)
+    TRAINING_DEADLINE: float = 60.0  # Секунд на обучение моделей одного анализа (0 — без ограничения)
     LSTM_EPOCHS: int = 50
     LSTM_BATCH_SIZE: int = 32
     LSTM_LOOK_BACK: int = 60
     LSTM_HIDDEN_SIZE: int = 50
     LSTM_NUM_LAYERS: int = 2
+    LSTM_STATEFUL_INFERENCE: bool = False  # Прогноз с переносом (h, c) между шагами
+    LSTM_NUM_THREADS: int = 0  # Потоков torch при обучении (0 — весь бюджет ядер)
+    LSTM_BF16: bool = False  # Прямой проход в bfloat16 при обучении на CPU
+    LSTM_COMPILE: bool = False  # torch.compile сети перед обучением
+    LSTM_EARLY_STOPPING_PATIENCE: int = 0  # Эпох без улучшения до остановки (0 — без ранней остановки)
+    LSTM_VALIDATION_SIZE: float = 0.1  # Доля обучающих окон для ранней остановки
 
     # Random Forest
     RF_N_ESTIMATORS: int = 100
     RF_MAX_DEPTH: int = 10
     RF_N_LAGS: int = 30
+    RF_TREES_PER_STEP: int = 10  # Деревьев за шаг наращивания леса при deadline или RF_OOB_TOLERANCE
+    RF_OOB_TOLERANCE: float = 0.0  # Относительное изменение OOB-ошибки для остановки (0 — без ранней остановки)
+    RF_COMPACT: bool = True  # Хранить и прогнозировать лес как CompactForest вместо деревьев sklearn
+    RF_COMPACT_TREES: int = 0  # Деревьев после отбора по близости к полному лесу (0 — все)
+    RF_COMPACT_MAX_DEPTH: int = 0  # Обрезка деревьев до глубины (0 — без обрезки)
 
     # ARIMA
     ARIMA_ORDER: tuple = (5, 1, 2)
+    ARIMA_MAXITER: int = 100  # Итераций оптимизатора при обучении
+    ARIMA_UPDATE_MAXITER: int = 20  # Итераций при дообучении на новых свечах
+    ARIMA_FULL_REFIT_EVERY: int = 20  # Полное переобучение через N дообучений
+
+    # Выполнение анализа
+    ANALYSIS_MAX_CONCURRENT: int = 2  # Одновременных анализов
+    ANALYSIS_PROCESS_WORKERS: int = 2  # Процессов для обучения моделей
+    ANALYSIS_IO_WORKERS: int = 4  # Потоков для загрузки данных и графиков
+    ANALYSIS_RESULTS_MAX_ENTRIES: int = 64  # Готовых анализов за текущий день
+    BATCH_MAX_TICKERS: int = 10  # Тикеров в одной команде /batch
+    WARMUP_IMPORTS: bool = True  # Загружать модули анализа в фоне после старта
+
+    # Кэш обученных моделей
+    MODEL_CACHE_MAX_ENTRIES: int = 64
+    MODEL_CACHE_TTL: int = 24 * 3600  # секунд (модели ночного прогрева живут до следующего)
+    MODEL_CACHE_MAX_MB: int = 512
+
+    # Сохраненные модели
+    ARTIFACTS_ENABLED: bool = True  # Сохранять обученные модели на диск
+    ARTIFACT_DIR: str = 'data/models'
+    ARTIFACT_KEEP_VERSIONS: int = 2  # Версий моделей одного тикера на диске
+
+    # Ночной прогрев популярных тикеров
+    PREWARM_ENABLED: bool = True
+    PREWARM_TIME: str = '01:00'  # Местное время запуска (вне торговой сессии)
+    PREWARM_TICKERS: tuple = ('AAPL', 'MSFT', 'GOOGL', 'TSLA', 'AMZN', 'NVDA', 'META')  # Плюс STATS_HOT_TICKERS популярных
+    PREWARM_CPU_BUDGET: int = 1  # Ядер на обучение при прогреве
 
     # Логирование
     LOG_FILE: str = 'logs.txt'
     LOG_FORMAT: str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    REQUEST_LOG_FORMAT: str = 'pipe'  # 'pipe' или 'jsonl'
+    REQUEST_LOG_BATCH_SIZE: int = 100  # Строк в одной записи на диск
+    REQUEST_LOG_FLUSH_INTERVAL: float = 1.0  # секунд
+    REQUEST_LOG_MAX_BYTES: int = 0  # Размер для ротации (0 — без ротации)
+    REQUEST_LOG_BACKUP_COUNT: int = 5
+
+    # Статистика
+    STATS_TOP_USERS_CAPACITY: int = 1000  # Счетчиков для топа пользователей
+    STATS_HOT_TICKERS: int = 10  # Размер списка популярных тикеров
+
+    # Метрики производительности
+    METRICS_ENABLED: bool = False  # Замеры этапов анализа и HTTP-эндпоинт /metrics
+    METRICS_HOST: str = '127.0.0.1'
+    METRICS_PORT: int = 9108
+    METRICS_PREFIX: str = 'finance_bot'
+    METRICS_BUCKETS: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)  # секунд
 
     # Визуализация
     FIGURE_SIZE: tuple = (14, 7)
     DPI: int = 100
+    CHART_FORMAT: str = 'png'  # 'png' или 'webp'
+    CHART_OPTIMIZE: bool = True  # Дополнительное сжатие PNG
+    CHART_WEBP_QUALITY: int = 85
+    BATCH_CHART_HISTORY_DAYS: int = 90  # Дней истории на общем графике /batch
 
 
 config = Config()
\ No newline at end of file
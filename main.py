@@ -3,15 +3,56 @@
 """
 
 import logging
+import sys
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler
 from bot.handlers import BotHandlers, TICKER, AMOUNT
-from utils.logger import setup_logging
+from utils.logger import setup_logging, request_log
+from utils.warmup import start_background_warmup
+from services.analysis_executor import analysis_executor
+from services.scheduler import PrewarmScheduler
+from utils import metrics
 from config import config
 
 # Настройка логирования
 setup_logging()
 logger = logging.getLogger(__name__)
 
+metrics_server = metrics.MetricsServer()
+
+
+def _cache_metrics() -> dict:
+    """Статистика кэша моделей (если модуль уже загружен)"""
+    module = sys.modules.get('services.model_cache')
+    if module is None:
+        return {}
+    return {f'model_cache_{name}': value for name, value in module.model_cache.get_stats().items()}
+
+
+async def post_init(application: Application):
+    """Фоновая загрузка модулей анализа, ночной прогрев и эндпоинт метрик"""
+    if config.WARMUP_IMPORTS:
+        start_background_warmup()
+
+    if config.PREWARM_ENABLED:
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна, установите python-telegram-bot[job-queue]")
+        else:
+            PrewarmScheduler.schedule(application.job_queue)
+
+    if config.METRICS_ENABLED:
+        metrics.registry.add_collector(
+            lambda: {f'analysis_{name}': value for name, value in analysis_executor.get_metrics().items()}
+        )
+        metrics.registry.add_collector(_cache_metrics)
+        metrics_server.start()
+
+
+async def post_shutdown(application: Application):
+    """Освобождение ресурсов при остановке бота"""
+    analysis_executor.shutdown()
+    request_log.close()
+    metrics_server.stop()
+
 
 def main():
     """Главная функция запуска бота"""
@@ -27,7 +68,15 @@ def main():
         return
 
     # Создание приложения
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    # concurrent_updates: пока идет анализ, бот продолжает отвечать другим
+    application = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Обработчик диалога
     conv_handler = ConversationHandler(
@@ -52,11 +101,14 @@ def main():
     # Добавление обработчиков
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler('help', BotHandlers.help_command))
+    application.add_handler(CommandHandler('batch', BotHandlers.batch_command))
+    application.add_handler(CommandHandler('stats', BotHandlers.stats_command))
 
     # Запуск бота
     logger.info("Бот успешно запущен и готов к работе!")
     logger.info(f"Прогноз на {config.FORECAST_DAYS} дней")
     logger.info(f"История данных: {config.HISTORY_DAYS} дней")
+    logger.info(f"Одновременных анализов: {config.ANALYSIS_MAX_CONCURRENT}")
     logger.info("-" * 60)
 
     application.run_polling(allowed_updates=None)
@@ -2,16 +2,23 @@
 ARIMA модель для прогнозирования
 """
 
+import os
+import warnings
+from typing import Optional
 import numpy as np
 import pandas as pd
+from statsmodels.tools.sm_exceptions import ConvergenceWarning
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import root_mean_squared_error
-from models.base_model import BaseModel
+from models.artifacts import read_meta, write_meta
+from models.base_model import BaseModel, STOP_CONVERGED, STOP_DEADLINE, STOP_LIMIT
 from config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
+ENDOG_FILE = 'endog.npy'
+
 
 class ARIMAModel(BaseModel):
     """ARIMA модель для временных рядов"""
@@ -20,26 +27,40 @@ class ARIMAModel(BaseModel):
         super().__init__("ARIMA")
         self.order = config.ARIMA_ORDER
         self.model_fit = None
+        self.rmse = float('inf')
+        self.last_index = None
+        self.updates_since_refit = 0
+
+    @staticmethod
+    def _create_model(endog: np.ndarray, order: tuple) -> SARIMAX:
+        return SARIMAX(
+            endog,
+            order=order,
+            seasonal_order=(0, 0, 0, 0),
+            enforce_stationarity=False,
+            enforce_invertibility=False
+        )
 
-    def train(self, data: pd.DataFrame, train_size: float = 0.8) -> float:
+    def train(self, data: pd.DataFrame, train_size: float = 0.8, deadline: Optional[float] = None) -> float:
         """Обучение ARIMA"""
         split_idx = int(len(data) * train_size)
-        train = data.iloc[:split_idx]['price']
-        test = data.iloc[split_idx:]['price']
+        train = data.iloc[:split_idx]['price'].values
+        test = data.iloc[split_idx:]['price'].values
 
         try:
-            model = SARIMAX(
-                train,
-                order=self.order,
-                seasonal_order=(0, 0, 0, 0),
-                enforce_stationarity=False,
-                enforce_invertibility=False
-            )
-            self.model_fit = model.fit(disp=False, maxiter=100)
+            model = self._create_model(train, self.order)
+            model_fit = self._fit(model, deadline)
 
-            predictions = self.model_fit.forecast(steps=len(test))
+            predictions = model_fit.forecast(steps=len(test))
             rmse = root_mean_squared_error(test, predictions)
 
+            # Добавляем тестовые наблюдения без переобучения,
+            # чтобы прогноз начинался с последней свечи
+            self.model_fit = model_fit.append(test)
+            self.rmse = rmse
+            self.last_index = data.index[-1]
+            self.updates_since_refit = 0
+
             self.trained = True
             return rmse
 
@@ -47,10 +68,159 @@ class ARIMAModel(BaseModel):
             logger.error(f"Ошибка обучения ARIMA: {e}")
             return float('inf')
 
+    def _fit(
+            self,
+            model: SARIMAX,
+            deadline: Optional[float] = None,
+            limit: Optional[int] = None,
+            start_params: Optional[np.ndarray] = None
+    ):
+        """
+        Оценка параметров не более чем за limit итераций
+        (по умолчанию config.ARIMA_MAXITER)
+
+        Оптимизация выполняется одним вызовом: deadline проверяется в
+        callback после каждой итерации, и StopIteration завершает ее с
+        текущими параметрами (поддерживается scipy.optimize >= 1.11)
+        """
+        if limit is None:
+            limit = config.ARIMA_MAXITER
+        reached_deadline = False
+
+        def check_deadline(params):
+            nonlocal reached_deadline
+            if self.deadline_passed(deadline):
+                reached_deadline = True
+                raise StopIteration
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ConvergenceWarning)
+            model_fit = model.fit(
+                start_params=start_params,
+                disp=False,
+                maxiter=limit,
+                callback=check_deadline if deadline is not None else None
+            )
+
+        retvals = model_fit.mle_retvals or {}
+        if retvals.get('converged'):
+            stopped = STOP_CONVERGED
+        elif reached_deadline:
+            stopped = STOP_DEADLINE
+        else:
+            stopped = STOP_LIMIT
+        # Остановка по deadline ожидаема, остальные предупреждения сохраняем
+        for warning in caught:
+            if stopped != STOP_DEADLINE or not issubclass(warning.category, ConvergenceWarning):
+                warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+
+        self.set_budget_used('iterations', retvals.get('iterations', limit), limit, stopped)
+        return model_fit
+
+    def update(self, data: pd.DataFrame, train_size: float = 0.8, deadline: Optional[float] = None) -> float:
+        """
+        Дообучение на новых свечах с текущими параметрами как стартовыми
+
+        Оптимизация ограничена config.ARIMA_UPDATE_MAXITER итерациями и
+        deadline, как в train
+
+        Полное переобучение выполняется каждые config.ARIMA_FULL_REFIT_EVERY
+        обновлений, а также если оптимизация разошлась: правдоподобие
+        стало хуже, чем у прежних параметров на тех же данных
+
+        Как и в train, параметры оцениваются только на обучающей части
+        data, а RMSE считается на тестовой, которую оптимизация не видела:
+        сравнение с другими моделями идет на одних и тех же свечах.
+        Тестовые наблюдения добавляются без переобучения уже после оценки
+        """
+        if not self.trained or self.model_fit is None:
+            return self.train(data, train_size, deadline)
+
+        new_obs = data.loc[data.index > self.last_index, 'price'].values
+        if len(new_obs) == 0:
+            self.set_budget_used('iterations', 0, config.ARIMA_UPDATE_MAXITER, STOP_CONVERGED)
+            return self.rmse
+
+        if self.updates_since_refit >= config.ARIMA_FULL_REFIT_EVERY:
+            logger.info("ARIMA: плановое полное переобучение")
+            return self.train(data, train_size, deadline)
+
+        split_idx = int(len(data) * train_size)
+        train = data.iloc[:split_idx]['price'].values
+        test = data.iloc[split_idx:]['price'].values
+
+        try:
+            # Прежние параметры на обучающей части: стартовая точка и ориентир
+            model = self._create_model(train, self.order)
+            params = self.model_fit.params
+            baseline = model.filter(params)
+            model_fit = self._fit(model, deadline, config.ARIMA_UPDATE_MAXITER, start_params=params)
+        except Exception as e:
+            logger.warning(f"ARIMA: ошибка дообучения ({e}), полное переобучение")
+            return self.train(data, train_size, deadline)
+
+        diverged = (
+            not np.all(np.isfinite(model_fit.params))
+            or not np.isfinite(model_fit.llf)
+            or model_fit.llf < baseline.llf - 1e-6 * abs(baseline.llf)
+        )
+        if diverged:
+            logger.warning("ARIMA: дообучение разошлось, полное переобучение")
+            return self.train(data, train_size, deadline)
+
+        try:
+            predictions = model_fit.forecast(steps=len(test))
+            rmse = root_mean_squared_error(test, predictions)
+            # Прогноз начинается с последней свечи
+            model_fit = model_fit.append(test)
+        except Exception as e:
+            logger.warning(f"ARIMA: ошибка оценки после дообучения ({e}), полное переобучение")
+            return self.train(data, train_size, deadline)
+
+        self.model_fit = model_fit
+        self.rmse = rmse
+        self.last_index = data.index[-1]
+        self.updates_since_refit += 1
+        logger.info(f"ARIMA: дообучение на {len(new_obs)} новых свечах")
+
+        return rmse
+
+    def save(self, directory: str):
+        """
+        Сохранение оцененных параметров и ряда
+
+        Объект результатов SARIMAX не сохраняется: при загрузке он
+        восстанавливается одним проходом фильтра Калмана с этими параметрами
+        """
+        if not self.trained or self.model_fit is None:
+            raise ValueError("Модель не обучена")
+
+        np.save(os.path.join(directory, ENDOG_FILE), np.asarray(self.model_fit.model.endog[:, 0]))
+        write_meta(
+            directory, self,
+            order=list(self.order),
+            params=np.asarray(self.model_fit.params).tolist(),
+            rmse=self.rmse,
+            last_index=pd.Timestamp(self.last_index).isoformat(),
+            updates_since_refit=self.updates_since_refit
+        )
+
+    def load(self, directory: str):
+        """Восстановление результатов SARIMAX по сохраненным параметрам"""
+        meta = read_meta(directory, self)
+
+        self.order = tuple(meta['order'])
+        endog = np.load(os.path.join(directory, ENDOG_FILE))
+        self.model_fit = self._create_model(endog, self.order).filter(np.array(meta['params']))
+        self.rmse = meta['rmse']
+        self.last_index = pd.Timestamp(meta['last_index'])
+        self.updates_since_refit = meta['updates_since_refit']
+        self.trained = True
+
     def predict(self, steps: int) -> np.ndarray:
         """Прогнозирование на будущее"""
         if not self.trained or self.model_fit is None:
             raise ValueError("Модель не обучена")
 
         predictions = self.model_fit.forecast(steps=steps)
-        return predictions.values
+        return np.asarray(predictions)
@@ -0,0 +1,69 @@
+"""
+Файлы сохраненных моделей: метаданные и ряд цен
+"""
+
+import json
+import os
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+
+# Версия формата артефактов; при несовместимых изменениях увеличивается,
+# и сохраненные раньше модели не загружаются
+ARTIFACT_FORMAT = 1
+
+META_FILE = 'meta.json'
+SERIES_FILE = 'series.npz'
+
+
+def write_meta(directory: str, model, **fields: Any):
+    """
+    Запись метаданных модели
+
+    Args:
+        directory: Каталог модели
+        model: Сохраняемая модель (BaseModel)
+        fields: Параметры конкретной модели (должны сериализоваться в JSON)
+    """
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'name': model.get_name(),
+        'class': f'{type(model).__module__}.{type(model).__qualname__}',
+        'budget_used': model.budget_used,
+        **fields,
+    }
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def read_meta(directory: str, model) -> Dict[str, Any]:
+    """Чтение метаданных с проверкой формата и класса модели"""
+    try:
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Не удалось прочитать {directory}: {e}") from e
+
+    if meta.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Формат артефакта {meta.get('format')}, ожидается {ARTIFACT_FORMAT}")
+    expected = f'{type(model).__module__}.{type(model).__qualname__}'
+    if meta.get('class') != expected:
+        raise ValueError(f"Артефакт модели {meta.get('class')}, ожидается {expected}")
+
+    model.budget_used = meta.get('budget_used', {})
+    return meta
+
+
+def save_series(directory: str, data: pd.DataFrame):
+    """Сохранение ряда цен, от последних значений которого строится прогноз"""
+    np.savez(
+        os.path.join(directory, SERIES_FILE),
+        price=data['price'].to_numpy(dtype=np.float64),
+        index=data.index.values.astype('datetime64[ns]')
+    )
+
+
+def load_series(directory: str) -> pd.DataFrame:
+    """Ряд цен в виде DataFrame с колонкой price"""
+    with np.load(os.path.join(directory, SERIES_FILE)) as series:
+        return pd.DataFrame({'price': series['price']}, index=pd.DatetimeIndex(series['index'], name='Date'))
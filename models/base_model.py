@@ -2,10 +2,17 @@
 Базовый класс для всех моделей
 """
 
+import time
 from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
 import numpy as np
 import pandas as pd
 
+# Причины остановки обучения
+STOP_LIMIT = 'limit'  # Исчерпан заданный объем обучения
+STOP_CONVERGED = 'converged'  # Сработал критерий сходимости
+STOP_DEADLINE = 'deadline'  # Истекло отведенное время
+
 
 class BaseModel(ABC):
     """Базовый класс для моделей прогнозирования"""
@@ -14,15 +21,23 @@ class BaseModel(ABC):
         self.name = name
         self.model = None
         self.trained = False
+        # Фактический объем последнего обучения, см. set_budget_used
+        self.budget_used: Dict[str, Any] = {}
 
     @abstractmethod
-    def train(self, data: pd.DataFrame, train_size: float) -> float:
+    def train(self, data: pd.DataFrame, train_size: float, deadline: Optional[float] = None) -> float:
         """
         Обучение модели
 
+        Обучение идет шагами (эпохи, группы деревьев, итерации оптимизатора)
+        и завершается раньше заданного объема, если модель сошлась или
+        наступил deadline. Первый шаг выполняется всегда
+
         Args:
             data: DataFrame с историческими данными
             train_size: Размер обучающей выборки (0-1)
+            deadline: Момент time.monotonic(), к которому обучение
+                нужно завершить (None — без ограничения)
 
         Returns:
             RMSE на тестовой выборке
@@ -42,6 +57,72 @@ class BaseModel(ABC):
         """
         pass
 
+    def update(self, data: pd.DataFrame, train_size: float, deadline: Optional[float] = None) -> float:
+        """
+        Обновление обученной модели на данных с новыми свечами
+
+        По умолчанию модель обучается заново
+
+        Args:
+            data: DataFrame с историческими данными
+            train_size: Размер обучающей выборки (0-1)
+            deadline: Момент time.monotonic(), к которому обучение нужно завершить
+
+        Returns:
+            RMSE на тестовой выборке
+        """
+        return self.train(data, train_size, deadline)
+
+    @staticmethod
+    def deadline_passed(deadline: Optional[float]) -> bool:
+        """Истекло ли отведенное на обучение время"""
+        return deadline is not None and time.monotonic() >= deadline
+
+    def set_budget_used(self, unit: str, used: int, limit: int, stopped: str):
+        """
+        Запись фактического объема обучения
+
+        Args:
+            unit: Единица шага обучения ('epochs', 'trees', 'iterations')
+            used: Выполнено шагов
+            limit: Заданный объем обучения
+            stopped: Причина остановки (STOP_LIMIT, STOP_CONVERGED, STOP_DEADLINE)
+        """
+        self.budget_used = {'unit': unit, 'used': used, 'limit': limit, 'stopped': stopped}
+
+    def save(self, directory: str):
+        """
+        Сохранение обученной модели в каталог
+
+        Сохраняется только необходимое для прогноза и дообучения, формат
+        описан в models/artifacts.py
+
+        Args:
+            directory: Существующий пустой каталог
+        """
+        raise NotImplementedError(f"Модель {self.name} не поддерживает сохранение")
+
+    def load(self, directory: str):
+        """
+        Загрузка модели, сохраненной save
+
+        Args:
+            directory: Каталог модели
+
+        Raises:
+            ValueError: Артефакт поврежден или сохранен в другом формате
+        """
+        raise NotImplementedError(f"Модель {self.name} не поддерживает загрузку")
+
+    def set_cpu_budget(self, n_threads: int):
+        """
+        Ограничение числа потоков, используемых моделью
+
+        Args:
+            n_threads: Количество потоков
+        """
+        pass
+
     def get_name(self) -> str:
         """Получить название модели"""
         return self.name
@@ -0,0 +1,210 @@
+"""
+Компактное представление обученного случайного леса для прогноза
+"""
+
+from typing import Optional, Sequence
+import numpy as np
+
+
+def _round_down_float32(values: np.ndarray) -> np.ndarray:
+    """
+    Наибольшее float32, не превосходящее значение
+
+    sklearn сравнивает признак float32 с порогом float64. Для x float32
+    x <= t равносильно x <= round_down(t), поэтому обход в float32 идет
+    по тем же ветвям
+    """
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def _flatten_tree(tree, max_depth: Optional[int]):
+    """
+    Массивы узлов одного дерева sklearn (tree_) с обрезкой по глубине
+
+    Листья ссылаются сами на себя, поэтому обход всех деревьев идет
+    одинаковое число шагов без проверки на лист. Узел на глубине
+    max_depth становится листом со средним значением своих примеров
+
+    Returns:
+        Кортеж (feature, threshold, left, right, value, глубина дерева),
+        индексы детей — внутри дерева
+    """
+    left = tree.children_left
+    right = tree.children_right
+    internal = left != -1
+
+    # Глубина узлов по уровням
+    depth = np.full(len(left), -1, dtype=np.int64)
+    level = np.array([0])
+    current = 0
+    while level.size:
+        depth[level] = current
+        parents = level[internal[level]]
+        level = np.concatenate([left[parents], right[parents]])
+        current += 1
+
+    keep = depth >= 0
+    if max_depth is not None:
+        keep &= depth <= max_depth
+        internal = internal & (depth < max_depth)
+
+    new_index = np.cumsum(keep) - 1
+    nodes = np.flatnonzero(keep)
+    is_internal = internal[nodes]
+    self_index = np.arange(len(nodes), dtype=np.int32)
+
+    feature = np.where(is_internal, tree.feature[nodes], 0).astype(np.int32)
+    threshold = np.where(is_internal, _round_down_float32(tree.threshold[nodes]), np.float32(np.inf))
+    child_left = np.where(is_internal, new_index[np.where(is_internal, left[nodes], 0)], self_index)
+    child_right = np.where(is_internal, new_index[np.where(is_internal, right[nodes], 0)], self_index)
+    value = tree.value[nodes, 0, 0]
+
+    return (
+        feature,
+        threshold.astype(np.float32),
+        child_left.astype(np.int32),
+        child_right.astype(np.int32),
+        value.astype(np.float32),
+        int(depth[nodes].max())
+    )
+
+
+class CompactForest:
+    """
+    Случайный лес регрессии в виде плоских массивов узлов
+
+    Узлы всех деревьев хранятся подряд: признак и индексы детей в int32,
+    порог и значение в float32 — примерно 20 байт на узел против ~70 у
+    деревьев sklearn. Обход векторизован: на каждом шаге все деревья
+    для всех строк спускаются на один уровень. Ветвление совпадает с
+    sklearn точно, прогноз отличается только округлением значений
+    листьев до float32 (признаки без пропусков)
+    """
+
+    def __init__(
+            self,
+            feature: np.ndarray,
+            threshold: np.ndarray,
+            left: np.ndarray,
+            right: np.ndarray,
+            value: np.ndarray,
+            offsets: np.ndarray,
+            depth: int,
+            n_features_in: int
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.offsets = offsets  # Начало узлов каждого дерева, offsets[-1] — число узлов
+        self.depth = depth
+        self.n_features_in_ = n_features_in
+
+    @classmethod
+    def from_estimator(cls, estimator, max_depth: Optional[int] = None) -> 'CompactForest':
+        """
+        Построение из обученного RandomForestRegressor
+
+        Args:
+            estimator: Обученный RandomForestRegressor с одним выходом
+            max_depth: Обрезать деревья до этой глубины (None — без обрезки)
+        """
+        return cls._concatenate(
+            [_flatten_tree(tree.tree_, max_depth) for tree in estimator.estimators_],
+            estimator.n_features_in_
+        )
+
+    @classmethod
+    def _concatenate(cls, trees: Sequence[tuple], n_features_in: int) -> 'CompactForest':
+        sizes = [len(tree[0]) for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int32)
+        return cls(
+            feature=np.concatenate([tree[0] for tree in trees]),
+            threshold=np.concatenate([tree[1] for tree in trees]),
+            left=np.concatenate([tree[2] + offset for tree, offset in zip(trees, offsets)]),
+            right=np.concatenate([tree[3] + offset for tree, offset in zip(trees, offsets)]),
+            value=np.concatenate([tree[4] for tree in trees]),
+            offsets=offsets,
+            depth=max(tree[5] for tree in trees),
+            n_features_in=n_features_in
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """Объем массивов узлов в байтах"""
+        return sum(
+            array.nbytes for array in
+            (self.feature, self.threshold, self.left, self.right, self.value, self.offsets)
+        )
+
+    def _tree(self, i: int) -> tuple:
+        """Массивы дерева i с индексами детей внутри дерева"""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return (
+            self.feature[start:end],
+            self.threshold[start:end],
+            self.left[start:end] - start,
+            self.right[start:end] - start,
+            self.value[start:end],
+            self.depth
+        )
+
+    def predict_trees(self, X: np.ndarray) -> np.ndarray:
+        """
+        Прогнозы каждого дерева
+
+        Args:
+            X: Признаки формы (n_samples, n_features)
+
+        Returns:
+            Массив формы (n_samples, n_trees)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.broadcast_to(self.offsets[:-1], (len(X), self.n_trees))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Среднее по деревьям, форма (n_samples,)"""
+        return self.predict_trees(X).mean(axis=1, dtype=np.float64)
+
+    def select(self, X: np.ndarray, n_trees: int) -> 'CompactForest':
+        """
+        Лес из n_trees деревьев, прогноз которых ближе всего к полному лесу
+
+        Деревья добавляются жадно по минимуму среднеквадратичного
+        отклонения от прогноза полного леса на X (дистилляция в подмножество)
+
+        Args:
+            X: Признаки для сравнения прогнозов (например, обучающая выборка)
+            n_trees: Количество деревьев
+        """
+        if n_trees >= self.n_trees:
+            return self
+
+        per_tree = self.predict_trees(X).astype(np.float64)
+        target = per_tree.mean(axis=1)
+
+        selected = []
+        total = np.zeros(len(per_tree))
+        available = np.ones(self.n_trees, dtype=bool)
+        for k in range(1, n_trees + 1):
+            errors = (((total[:, np.newaxis] + per_tree) / k - target[:, np.newaxis]) ** 2).mean(axis=0)
+            errors[~available] = np.inf
+            best = int(np.argmin(errors))
+            selected.append(best)
+            available[best] = False
+            total += per_tree[:, best]
+
+        return self._concatenate([self._tree(i) for i in sorted(selected)], self.n_features_in_)
@@ -2,15 +2,25 @@
 LSTM модель для прогнозирования
 """
 
+import copy
+import logging
+import os
+from typing import Optional
 import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, TensorDataset
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import root_mean_squared_error
-from models.base_model import BaseModel
+from models.artifacts import load_series, read_meta, save_series, write_meta
+from models.base_model import BaseModel, STOP_CONVERGED, STOP_DEADLINE, STOP_LIMIT
 from config import config
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_FILE = 'weights.pt'
 
 
 class LSTMNetwork(nn.Module):
@@ -42,6 +52,23 @@ class LSTMNetwork(nn.Module):
         out = self.fc2(out)
         return out
 
+    def forward_with_state(self, x, state=None):
+        """
+        Прямой проход с передачей скрытого состояния
+
+        Args:
+            x: Вход формы (batch, seq_len, 1)
+            state: Кортеж (h, c) предыдущего вызова или None (нулевое состояние)
+
+        Returns:
+            Кортеж (выход для последнего шага, новое состояние (h, c))
+        """
+        out, state = self.lstm(x, state)
+        out = out[:, -1, :]
+        out = self.relu(self.fc1(out))
+        out = self.fc2(out)
+        return out, state
+
 
 class LSTMModel(BaseModel):
     """LSTM модель для временных рядов"""
@@ -52,51 +79,88 @@ class LSTMModel(BaseModel):
         self.scaler = StandardScaler()
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.data = None
+        self.epochs_trained = 0
+
+    def set_cpu_budget(self, n_threads: int):
+        """
+        Ограничение числа потоков torch (действует на весь процесс)
+
+        Небольшой LSTM плохо масштабируется по ядрам, поэтому число
+        потоков дополнительно ограничивается config.LSTM_NUM_THREADS
+        """
+        if config.LSTM_NUM_THREADS > 0:
+            n_threads = min(n_threads, config.LSTM_NUM_THREADS)
+        torch.set_num_threads(n_threads)
 
     def prepare_sequences(self, data: np.ndarray) -> tuple:
-        """Подготовка последовательностей для LSTM"""
-        X, y = [], []
-        for i in range(self.look_back, len(data)):
-            X.append(data[i-self.look_back:i])
-            y.append(data[i])
-        return np.array(X), np.array(y)
-
-    def train(self, data: pd.DataFrame, train_size: float = 0.8) -> float:
+        """
+        Подготовка последовательностей для LSTM
+
+        Окна строятся как представление исходного массива без копирования
+
+        Args:
+            data: Ряд формы (n,) или (n, 1)
+
+        Returns:
+            Кортеж (X формы (samples, look_back, 1), y формы (samples, 1))
+        """
+        series = np.asarray(data, dtype=np.float32).reshape(-1)
+        if len(series) <= self.look_back:
+            return (
+                np.empty((0, self.look_back, 1), dtype=np.float32),
+                np.empty((0, 1), dtype=np.float32)
+            )
+
+        X = sliding_window_view(series[:-1], self.look_back)[:, :, np.newaxis]
+        y = series[self.look_back:, np.newaxis]
+        return X, y
+
+    def prepare_tensors(self, data: np.ndarray, pin_memory: bool = False) -> tuple:
+        """
+        Подготовка последовательностей сразу в виде тензоров на устройстве
+
+        Args:
+            data: Ряд формы (n,) или (n, 1)
+            pin_memory: Использовать page-locked буфер для копирования на GPU
+
+        Returns:
+            Кортеж тензоров (X формы (samples, look_back, 1), y формы (samples, 1))
+        """
+        series = torch.from_numpy(np.asarray(data, dtype=np.float32).reshape(-1))
+        if len(series) <= self.look_back:
+            return (
+                torch.empty((0, self.look_back, 1), device=self.device),
+                torch.empty((0, 1), device=self.device)
+            )
+
+        if pin_memory and self.device.type == 'cuda':
+            series = series.pin_memory()
+
+        # Один буфер ряда на устройстве, окна — его представление
+        series = series.to(self.device, non_blocking=pin_memory)
+        X = series[:-1].unfold(0, self.look_back, 1).unsqueeze(-1)
+        y = series[self.look_back:].unsqueeze(-1)
+        return X, y
+
+    def train(self, data: pd.DataFrame, train_size: float = 0.8, deadline: Optional[float] = None) -> float:
         """Обучение LSTM"""
         self.data = data
-        prices = data['price'].values.reshape(-1, 1)
-        scaled_prices = self.scaler.fit_transform(prices)
+        with span('features', model=self.name):
+            prices = data['price'].values.reshape(-1, 1)
+            scaled_prices = self.scaler.fit_transform(prices)
 
-        split_idx = int(len(scaled_prices) * train_size)
-        train = scaled_prices[:split_idx]
-        test = scaled_prices[split_idx:]
+            split_idx = int(len(scaled_prices) * train_size)
+            train = scaled_prices[:split_idx]
+            test = scaled_prices[split_idx:]
 
-        X_train, y_train = self.prepare_sequences(train)
-        X_test, y_test = self.prepare_sequences(test)
+            # Тензоры формы (samples, seq_len, 1) и (samples, 1)
+            pin_memory = self.device.type == 'cuda'
+            X_train, y_train = self.prepare_tensors(train, pin_memory=pin_memory)
+            X_test, y_test = self.prepare_tensors(test, pin_memory=pin_memory)
 
         if len(X_train) == 0 or len(X_test) == 0:
             return float('inf')
 
-        # Конвертация в PyTorch tensors
-        # X уже имеет форму (samples, seq_len), добавляем размерность фичей
-        X_train = torch.FloatTensor(X_train).to(self.device)
-        if X_train.dim() == 2:
-            X_train = X_train.unsqueeze(-1)  # (samples, seq_len, 1)
-        y_train = torch.FloatTensor(y_train).to(self.device)
-
-        X_test = torch.FloatTensor(X_test).to(self.device)
-        if X_test.dim() == 2:
-            X_test = X_test.unsqueeze(-1)  # (samples, seq_len, 1)
-        y_test = torch.FloatTensor(y_test).to(self.device)
-
-        # DataLoader (shuffle=False для временных рядов!)
-        train_dataset = TensorDataset(X_train, y_train)
-        train_loader = DataLoader(
-            train_dataset,
-            batch_size=config.LSTM_BATCH_SIZE,
-            shuffle=False
-        )
-
         # Создание модели
         self.model = LSTMNetwork(
             input_size=1,
@@ -105,18 +169,7 @@ class LSTMModel(BaseModel):
             output_size=1
         ).to(self.device)
 
-        criterion = nn.MSELoss()
-        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.001)
-
-        # Обучение
-        self.model.train()
-        for epoch in range(config.LSTM_EPOCHS):
-            for batch_X, batch_y in train_loader:
-                optimizer.zero_grad()
-                outputs = self.model(batch_X)
-                loss = criterion(outputs, batch_y)
-                loss.backward()
-                optimizer.step()
+        self.fit(X_train, y_train, deadline)
 
         # Оценка
         self.model.eval()
@@ -130,31 +183,187 @@ class LSTMModel(BaseModel):
 
         return rmse
 
+    def fit(self, X_train: torch.Tensor, y_train: torch.Tensor, deadline: Optional[float] = None):
+        """
+        Цикл обучения
+
+        Батчи — срезы тензоров (shuffle=False для временных рядов!), без
+        DataLoader. На CPU прямой проход можно выполнять в bfloat16
+        (config.LSTM_BF16), параметры и оптимизатор остаются float32.
+        При config.LSTM_EARLY_STOPPING_PATIENCE > 0 последние
+        config.LSTM_VALIDATION_SIZE обучающих окон используются для
+        ранней остановки, и сеть возвращается к эпохе с лучшей ошибкой.
+        После deadline обучение завершается по окончании текущей эпохи
+        """
+        patience = config.LSTM_EARLY_STOPPING_PATIENCE
+        X_val = y_val = None
+        if patience > 0:
+            n_val = int(len(X_train) * config.LSTM_VALIDATION_SIZE)
+            if 0 < n_val < len(X_train):
+                X_train, X_val = X_train[:-n_val], X_train[-n_val:]
+                y_train, y_val = y_train[:-n_val], y_train[-n_val:]
+
+        use_bf16 = config.LSTM_BF16 and self.device.type == 'cpu'
+        batch_size = config.LSTM_BATCH_SIZE
+        # Скомпилированная сеть разделяет параметры с self.model,
+        # в кэш и в процессы сохраняется исходная
+        network = torch.compile(self.model) if config.LSTM_COMPILE else self.model
+
+        criterion = nn.MSELoss()
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.001)
+
+        best_loss = float('inf')
+        best_state = None
+        epochs_without_improvement = 0
+
+        self.epochs_trained = 0
+        stopped = STOP_LIMIT
+        for epoch in range(config.LSTM_EPOCHS):
+            self.model.train()
+            for start in range(0, len(X_train), batch_size):
+                batch_X = X_train[start:start + batch_size]
+                batch_y = y_train[start:start + batch_size]
+
+                optimizer.zero_grad(set_to_none=True)
+                with torch.autocast('cpu', dtype=torch.bfloat16, enabled=use_bf16):
+                    try:
+                        outputs = network(batch_X)
+                    except Exception as e:
+                        # Компиляция выполняется при первом вызове
+                        if network is self.model:
+                            raise
+                        logger.warning(f"torch.compile недоступен, обучение без компиляции: {e}")
+                        network = self.model
+                        outputs = network(batch_X)
+                loss = criterion(outputs.float(), batch_y)
+                loss.backward()
+                optimizer.step()
+            self.epochs_trained = epoch + 1
+
+            if X_val is not None:
+                # Ранняя остановка по ошибке на валидационных окнах
+                self.model.eval()
+                with torch.no_grad():
+                    val_loss = criterion(self.model(X_val), y_val).item()
+                if val_loss < best_loss:
+                    best_loss = val_loss
+                    best_state = copy.deepcopy(self.model.state_dict())
+                    epochs_without_improvement = 0
+                else:
+                    epochs_without_improvement += 1
+                    if epochs_without_improvement >= patience:
+                        stopped = STOP_CONVERGED
+                        break
+
+            if self.deadline_passed(deadline) and self.epochs_trained < config.LSTM_EPOCHS:
+                stopped = STOP_DEADLINE
+                break
+
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        self.set_budget_used('epochs', self.epochs_trained, config.LSTM_EPOCHS, stopped)
+
+    def save(self, directory: str):
+        """Сохранение весов сети (state_dict), параметров scaler и ряда цен"""
+        if not self.trained:
+            raise ValueError("Модель не обучена")
+
+        torch.save(self.model.state_dict(), os.path.join(directory, WEIGHTS_FILE))
+        save_series(directory, self.data)
+        write_meta(
+            directory, self,
+            look_back=self.look_back,
+            hidden_size=self.model.hidden_size,
+            num_layers=self.model.num_layers,
+            scaler_mean=self.scaler.mean_.tolist(),
+            scaler_scale=self.scaler.scale_.tolist(),
+            scaler_var=self.scaler.var_.tolist(),
+            scaler_n_samples=int(self.scaler.n_samples_seen_),
+            epochs_trained=self.epochs_trained
+        )
+
+    def load(self, directory: str):
+        """Загрузка сети с размерами из метаданных"""
+        meta = read_meta(directory, self)
+
+        self.look_back = meta['look_back']
+        self.model = LSTMNetwork(
+            input_size=1,
+            hidden_size=meta['hidden_size'],
+            num_layers=meta['num_layers'],
+            output_size=1
+        ).to(self.device)
+        state_dict = torch.load(
+            os.path.join(directory, WEIGHTS_FILE), map_location=self.device, weights_only=True
+        )
+        self.model.load_state_dict(state_dict)
+
+        self.scaler = StandardScaler()
+        self.scaler.mean_ = np.array(meta['scaler_mean'])
+        self.scaler.scale_ = np.array(meta['scaler_scale'])
+        self.scaler.var_ = np.array(meta['scaler_var'])
+        self.scaler.n_samples_seen_ = meta['scaler_n_samples']
+        self.scaler.n_features_in_ = len(self.scaler.mean_)
+
+        self.epochs_trained = meta['epochs_trained']
+        self.data = load_series(directory)
+        self.trained = True
+
     def predict(self, steps: int) -> np.ndarray:
         """Прогнозирование на будущее"""
         if not self.trained:
             raise ValueError("Модель не обучена")
 
-        self.model.eval()
-        predictions = []
+        last_window = self.data['price'].values[-self.look_back:]
+        return self.forecast(last_window[np.newaxis, :], steps)[0]
 
-        prices = self.data['price'].values.reshape(-1, 1)
-        scaled_prices = self.scaler.transform(prices)
-        last_sequence = scaled_prices[-self.look_back:]
+    def forecast(self, windows: np.ndarray, steps: int, stateful: bool = None) -> np.ndarray:
+        """
+        Авторегрессионный прогноз сразу для нескольких рядов одним батчем
 
-        with torch.no_grad():
-            for _ in range(steps):
-                # Подготовка входа: (1, seq_len, 1)
-                input_seq = torch.FloatTensor(last_sequence).unsqueeze(0).to(self.device)
-                if input_seq.dim() == 2:
-                    input_seq = input_seq.unsqueeze(-1)
+        Все ряды прогнозируются этой сетью и нормируются ее scaler,
+        поэтому батч имеет смысл для рядов одного тикера (сценарии,
+        разные точки старта) или тикеров с общей моделью
+
+        Args:
+            windows: Последние цены рядов формы (batch, look_back)
+            steps: Количество шагов для прогноза
+            stateful: Переносить скрытое состояние (h, c) между шагами
+                вместо повторного прогона окна (по умолчанию
+                config.LSTM_STATEFUL_INFERENCE)
+
+        Returns:
+            Массив прогнозов формы (batch, steps)
+        """
+        if not self.trained:
+            raise ValueError("Модель не обучена")
+        if stateful is None:
+            stateful = config.LSTM_STATEFUL_INFERENCE
+
+        windows = np.asarray(windows, dtype=np.float64)
+        batch_size, window_size = windows.shape
+        scaled = self.scaler.transform(windows.reshape(-1, 1)).reshape(batch_size, window_size)
 
-                # Прогноз
-                pred_scaled = self.model(input_seq).cpu().numpy().reshape(-1, 1)
-                pred = self.scaler.inverse_transform(pred_scaled)[0, 0]
-                predictions.append(pred)
+        # Заранее выделенный буфер: окно истории + все шаги прогноза
+        buffer = torch.empty((batch_size, window_size + steps, 1), device=self.device)
+        buffer[:, :window_size, 0] = torch.from_numpy(scaled.astype(np.float32)).to(self.device)
 
-                # Обновление последовательности
-                last_sequence = np.append(last_sequence[1:], pred_scaled.reshape(-1, 1), axis=0)
+        self.model.eval()
+        with torch.no_grad():
+            if stateful:
+                # Окно прогоняется один раз, далее сеть получает по одной точке
+                out, state = self.model.forward_with_state(buffer[:, :window_size], None)
+                for i in range(steps):
+                    buffer[:, window_size + i] = out
+                    if i + 1 < steps:
+                        out, state = self.model.forward_with_state(
+                            buffer[:, window_size + i:window_size + i + 1], state
+                        )
+            else:
+                # Скользящее окно — представление буфера, без копирования
+                for i in range(steps):
+                    buffer[:, window_size + i] = self.model(buffer[:, i:i + window_size])
 
-        return np.array(predictions)
+        # Обратное масштабирование всего горизонта за один вызов
+        forecast_scaled = buffer[:, window_size:, 0].cpu().numpy()
+        return self.scaler.inverse_transform(forecast_scaled.reshape(-1, 1)).reshape(batch_size, steps)
@@ -2,12 +2,72 @@
 Random Forest модель для прогнозирования
 """
 
+import os
+from typing import Optional
+import joblib
 import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import root_mean_squared_error
-from models.base_model import BaseModel
+from models.artifacts import load_series, read_meta, save_series, write_meta
+from models.base_model import BaseModel, STOP_CONVERGED, STOP_DEADLINE, STOP_LIMIT
+from models.compact_forest import CompactForest
 from config import config
+from utils.metrics import span
+
+# Окна скользящих средних
+MA_SHORT = 7
+MA_LONG = 30
+
+FOREST_FILE = 'forest.joblib'
+
+
+class RollingFeatureState:
+    """
+    Признаки для рекурсивного прогноза на кольцевом буфере цен
+
+    Хранит последние цены и суммы окон скользящих средних, поэтому
+    добавление новой цены и построение вектора признаков не требуют
+    пересчета по всей истории. Порядок признаков совпадает с
+    RandomForestModel.create_lag_features
+    """
+
+    def __init__(self, prices: np.ndarray, n_lags: int):
+        self.n_lags = n_lags
+        self.size = max(n_lags, MA_LONG, 2)
+
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(prices) < self.size:
+            raise ValueError(f"Нужно минимум {self.size} цен, получено {len(prices)}")
+
+        # Кольцевой буфер: pos указывает на самую старую цену
+        self.buffer = prices[-self.size:].copy()
+        self.pos = 0
+        self.sum_short = self.buffer[-MA_SHORT:].sum()
+        self.sum_long = self.buffer[-MA_LONG:].sum()
+
+        self._lag_offsets = np.arange(1, n_lags + 1)
+        self._features = np.empty(n_lags + 3)
+
+    def _get(self, k: int) -> float:
+        """k-я с конца цена (k=1 — последняя)"""
+        return self.buffer[(self.pos - k) % self.size]
+
+    def push(self, price: float):
+        """Добавление новой цены"""
+        self.sum_short += price - self._get(MA_SHORT)
+        self.sum_long += price - self._get(MA_LONG)
+        self.buffer[self.pos] = price
+        self.pos = (self.pos + 1) % self.size
+
+    def features(self) -> np.ndarray:
+        """Вектор признаков для следующего шага (lag_1..lag_n, ma_7, ma_30, price_change)"""
+        self._features[:self.n_lags] = self.buffer[(self.pos - self._lag_offsets) % self.size]
+        self._features[self.n_lags] = self.sum_short / MA_SHORT
+        self._features[self.n_lags + 1] = self.sum_long / MA_LONG
+        self._features[self.n_lags + 2] = self._get(1) / self._get(2) - 1
+        return self._features
 
 
 class RandomForestModel(BaseModel):
@@ -16,81 +76,165 @@ class RandomForestModel(BaseModel):
     def __init__(self):
         super().__init__("Random Forest")
         self.n_lags = config.RF_N_LAGS
-        self.last_data = None
         self.data = None
+        self.n_jobs = -1
 
     def create_lag_features(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Создание лаговых признаков"""
+        """
+        Создание лаговых признаков
+
+        Все признаки строки t считаются по ценам до t-1 включительно,
+        чтобы при прогнозе их можно было получить из уже известных цен
+        """
         df = data.copy()
+        previous = df['price'].shift(1)
 
         # Лаговые признаки
         for i in range(1, self.n_lags + 1):
             df[f'lag_{i}'] = df['price'].shift(i)
 
         # Скользящие средние
-        df['ma_7'] = df['price'].rolling(window=7).mean()
-        df['ma_30'] = df['price'].rolling(window=30).mean()
+        df['ma_7'] = previous.rolling(window=MA_SHORT).mean()
+        df['ma_30'] = previous.rolling(window=MA_LONG).mean()
 
         # Скорость изменения
-        df['price_change'] = df['price'].pct_change()
+        df['price_change'] = previous.pct_change()
 
         return df.dropna()
 
-    def train(self, data: pd.DataFrame, train_size: float = 0.8) -> float:
-        """Обучение Random Forest"""
+    def set_cpu_budget(self, n_threads: int):
+        """Ограничение числа потоков sklearn"""
+        self.n_jobs = n_threads
+
+    def train(self, data: pd.DataFrame, train_size: float = 0.8, deadline: Optional[float] = None) -> float:
+        """
+        Обучение Random Forest
+
+        С deadline или config.RF_OOB_TOLERANCE лес наращивается по
+        config.RF_TREES_PER_STEP деревьев (warm_start) до config.RF_N_ESTIMATORS,
+        пока OOB-ошибка меняется больше допуска и не наступил deadline.
+        Деревья совпадают с построенными за один вызов fit
+        """
         self.data = data
-        df = self.create_lag_features(data)
+        with span('features', model=self.name):
+            df = self.create_lag_features(data)
 
         split_idx = int(len(df) * train_size)
         train = df.iloc[:split_idx]
         test = df.iloc[split_idx:]
 
         feature_cols = [col for col in df.columns if col != 'price']
-        X_train = train[feature_cols]
-        y_train = train['price']
-        X_test = test[feature_cols]
-        y_test = test['price']
+        X_train = train[feature_cols].values
+        y_train = train['price'].values
+        X_test = test[feature_cols].values
+        y_test = test['price'].values
+
+        limit = config.RF_N_ESTIMATORS
+        tolerance = config.RF_OOB_TOLERANCE
+        # Без ограничений лес строится за один вызов fit
+        step = config.RF_TREES_PER_STEP if deadline is not None or tolerance > 0 else limit
 
         self.model = RandomForestRegressor(
-            n_estimators=config.RF_N_ESTIMATORS,
+            n_estimators=min(step, limit),
             max_depth=config.RF_MAX_DEPTH,
             random_state=42,
-            n_jobs=-1
+            n_jobs=self.n_jobs,
+            warm_start=True,
+            oob_score=tolerance > 0
         )
-        self.model.fit(X_train, y_train)
+
+        stopped = STOP_LIMIT
+        previous_oob = None
+        while True:
+            self.model.fit(X_train, y_train)
+            n_trees = len(self.model.estimators_)
+            if n_trees >= limit:
+                break
+
+            if tolerance > 0:
+                oob_rmse = root_mean_squared_error(y_train, self.model.oob_prediction_)
+                if previous_oob is not None and abs(previous_oob - oob_rmse) <= tolerance * previous_oob:
+                    stopped = STOP_CONVERGED
+                    break
+                previous_oob = oob_rmse
+
+            if self.deadline_passed(deadline):
+                stopped = STOP_DEADLINE
+                break
+
+            self.model.n_estimators = min(n_trees + step, limit)
+
+        self.set_budget_used('trees', n_trees, limit, stopped)
+
+        if config.RF_COMPACT:
+            # Деревья sklearn больше не нужны: RMSE считается по тому же лесу, что и прогноз
+            forest = CompactForest.from_estimator(self.model, max_depth=config.RF_COMPACT_MAX_DEPTH or None)
+            if config.RF_COMPACT_TREES > 0:
+                forest = forest.select(X_train, config.RF_COMPACT_TREES)
+            self.model = forest
 
         predictions = self.model.predict(X_test)
         rmse = root_mean_squared_error(y_test, predictions)
 
-        # Сохраняем последние данные для прогноза
-        self.last_data = df.iloc[-1:].copy()
         self.trained = True
 
         return rmse
 
+    def save(self, directory: str):
+        """Сохранение леса (joblib без сжатия) и ряда цен"""
+        if not self.trained:
+            raise ValueError("Модель не обучена")
+
+        # Без сжатия массивы деревьев при загрузке отображаются в память
+        joblib.dump(self.model, os.path.join(directory, FOREST_FILE))
+        save_series(directory, self.data)
+        compact = isinstance(self.model, CompactForest)
+        write_meta(
+            directory, self,
+            n_lags=self.n_lags,
+            compact=compact,
+            sklearn_version=None if compact else sklearn.__version__
+        )
+
+    def load(self, directory: str):
+        """Загрузка леса с memory map массивов деревьев"""
+        meta = read_meta(directory, self)
+        # Деревья другой версии sklearn могут не загрузиться или отличаться,
+        # CompactForest состоит только из массивов NumPy
+        if not meta.get('compact') and meta.get('sklearn_version') != sklearn.__version__:
+            raise ValueError(
+                f"Лес сохранен в sklearn {meta.get('sklearn_version')}, установлена {sklearn.__version__}"
+            )
+
+        self.model = joblib.load(os.path.join(directory, FOREST_FILE), mmap_mode='r')
+        self.n_lags = meta['n_lags']
+        self.data = load_series(directory)
+        self.trained = True
+
     def predict(self, steps: int) -> np.ndarray:
         """Прогнозирование на будущее"""
         if not self.trained:
             raise ValueError("Модель не обучена")
 
-        predictions = []
-        current_data = self.last_data.copy()
-
-        df = self.create_lag_features(self.data)
-        feature_cols = [col for col in df.columns if col != 'price']
+        state = RollingFeatureState(self.data['price'].values, self.n_lags)
+        predictions = np.empty(steps)
 
-        for _ in range(steps):
-            pred = self.model.predict(current_data[feature_cols])[0]
-            predictions.append(pred)
+        if isinstance(self.model, CompactForest):
+            for i in range(steps):
+                pred = self.model.predict(state.features()[np.newaxis])[0]
+                predictions[i] = pred
+                state.push(pred)
+            return predictions
 
-            # Обновляем лаги
-            new_row = current_data.copy()
-            new_row['price'] = pred
-            for i in range(self.n_lags, 1, -1):
-                if f'lag_{i}' in new_row.columns:
-                    new_row[f'lag_{i}'] = current_data[f'lag_{i-1}'].values[0]
-            new_row['lag_1'] = pred
+        # Для одной строки вызываем деревья напрямую: RandomForestRegressor.predict
+        # тратит больше времени на проверку входа и пул потоков, чем на обход
+        trees = [estimator.tree_ for estimator in self.model.estimators_]
+        x = np.empty((1, self.model.n_features_in_), dtype=np.float32)
 
-            current_data = new_row
+        for i in range(steps):
+            x[0] = state.features()
+            pred = sum(tree.predict(x)[0, 0] for tree in trees) / len(trees)
+            predictions[i] = pred
+            state.push(pred)
 
-        return np.array(predictions)
\ No newline at end of file
+        return predictions
@@ -0,0 +1,77 @@
+"""
+Реестр моделей прогнозирования
+"""
+
+import importlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from models.base_model import BaseModel
+from config import config
+
+
+@dataclass
+class ModelSpec:
+    """Описание модели в реестре"""
+
+    name: str
+    module: str
+    class_name: str
+    cost: float  # Ожидаемая относительная стоимость обучения
+
+
+class ModelRegistry:
+    """
+    Реестр моделей
+
+    Модель описывается модулем и классом, поэтому регистрация не
+    импортирует тяжелые библиотеки: модуль загружается при первом
+    создании модели
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, ModelSpec] = {}
+
+    def register(self, name: str, module: str, class_name: str, cost: float):
+        """Регистрация модели по пути к классу"""
+        self._specs[name] = ModelSpec(name, module, class_name, cost)
+
+    def register_class(self, name: str, cost: float):
+        """
+        Декоратор для регистрации класса модели
+
+        Пример:
+            @model_registry.register_class('Prophet', cost=5.0)
+            class ProphetModel(BaseModel): ...
+        """
+        def decorator(cls):
+            self.register(name, cls.__module__, cls.__qualname__, cost)
+            return cls
+        return decorator
+
+    def get(self, name: str) -> ModelSpec:
+        if name not in self._specs:
+            raise KeyError(f"Модель {name} не зарегистрирована")
+        return self._specs[name]
+
+    def names(self) -> List[str]:
+        """Все зарегистрированные модели в порядке регистрации"""
+        return list(self._specs)
+
+    def enabled(self, names: Optional[List[str]] = None) -> List[ModelSpec]:
+        """Включенные в конфигурации модели (config.ENABLED_MODELS)"""
+        enabled = names if names is not None else config.ENABLED_MODELS
+        return [spec for name, spec in self._specs.items() if name in enabled]
+
+    def create(self, name: str) -> BaseModel:
+        """Создание экземпляра модели"""
+        spec = self.get(name)
+        module = importlib.import_module(spec.module)
+        return getattr(module, spec.class_name)()
+
+
+model_registry = ModelRegistry()
+
+# Встроенные модели; стоимость — примерное время обучения относительно Random Forest
+model_registry.register('Random Forest', 'models.random_forest', 'RandomForestModel', cost=1.0)
+model_registry.register('ARIMA', 'models.arima_model', 'ARIMAModel', cost=1.0)
+model_registry.register('LSTM', 'models.lstm_model', 'LSTMModel', cost=10.0)
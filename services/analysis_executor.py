@@ -0,0 +1,144 @@
+"""
+Исполнитель тяжелых задач анализа вне event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from config import config
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisExecutor:
+    """
+    Выполняет обучение моделей в пуле процессов, а загрузку данных
+    и построение графиков в пуле потоков, ограничивая число
+    одновременно выполняемых анализов
+    """
+
+    def __init__(
+            self,
+            max_concurrent: int = config.ANALYSIS_MAX_CONCURRENT,
+            process_workers: int = config.ANALYSIS_PROCESS_WORKERS,
+            io_workers: int = config.ANALYSIS_IO_WORKERS
+    ):
+        self.max_concurrent = max_concurrent
+        self.process_workers = process_workers
+        self.io_workers = io_workers
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+
+        # Метрики очереди
+        self._waiting = 0
+        self._active = 0
+        self._completed = 0
+        self._max_queue_depth = 0
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Ленивое создание пула процессов"""
+        if self._process_pool is None:
+            # spawn: fork процесса с запущенными потоками torch может зависнуть
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._process_pool
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        """Ленивое создание пула потоков"""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.io_workers,
+                thread_name_prefix='analysis-io'
+            )
+        return self._thread_pool
+
+    def queue_position(self) -> int:
+        """
+        Позиция нового запроса в очереди
+
+        Returns:
+            0, если анализ начнется сразу, иначе номер в очереди
+        """
+        if self._waiting == 0 and self._active < self.max_concurrent:
+            return 0
+        return self._waiting + 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Ожидание свободного слота для анализа"""
+        self._waiting += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._waiting)
+        try:
+            with metrics.span('queue_wait'):
+                await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        """Выполнение CPU-задачи в пуле процессов"""
+        loop = asyncio.get_running_loop()
+        try:
+            if not metrics.is_enabled():
+                return await loop.run_in_executor(self._get_process_pool(), func, *args)
+            # Замеры из процесса-воркера добавляются к метрикам и разбивке запроса
+            result, spans = await loop.run_in_executor(
+                self._get_process_pool(), metrics.run_collecting, True, func, *args
+            )
+            metrics.merge_spans(spans)
+            return result
+        except BrokenProcessPool:
+            # Процесс-воркер упал: пересоздаем пул для следующих запросов
+            logger.error("Пул процессов поврежден, пересоздаю")
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+            raise
+
+    async def run_io(self, func: Callable, *args) -> Any:
+        """Выполнение задачи ввода-вывода в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        # Контекст запроса (разбивка замеров) передается в поток
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._get_thread_pool(), functools.partial(context.run, func, *args)
+        )
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Получить метрики очереди"""
+        return {
+            'queue_depth': self._waiting,
+            'active': self._active,
+            'completed': self._completed,
+            'max_queue_depth': self._max_queue_depth,
+            'max_concurrent': self.max_concurrent
+        }
+
+    def shutdown(self):
+        """Остановка пулов"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+analysis_executor = AnalysisExecutor()
@@ -0,0 +1,382 @@
+"""
+Сервис анализа тикера: загрузка данных, обучение, прогноз и график
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from services.analysis_executor import analysis_executor
+from services.artifact_store import artifact_store
+from services.data_service import DataService
+from services.model_cache import ModelCache, model_cache
+from services.model_selection import model_selection_policy
+from services.price_store import exchange_today
+from services.prediction_service import (
+    PredictionService, get_cpu_budget, get_deadline, group_models, plan_training, train_models,
+    train_prediction_service
+)
+from services.visualization_service import VisualizationService
+from utils.trading_signals import TradingSignals
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AnalysisResult:
+    """Результат анализа тикера, общий для всех запросов по нему"""
+
+    ticker: str
+    data: pd.DataFrame
+    predictions: np.ndarray
+    results: Dict[str, Any]  # PredictionService.get_results_summary()
+    buy_days: np.ndarray
+    sell_days: np.ndarray
+    chart: Optional[bytes] = None  # В пакетном анализе строится один общий график
+
+
+@dataclass
+class BatchAnalysisResult:
+    """Результат пакетного анализа нескольких тикеров"""
+
+    results: Dict[str, AnalysisResult]
+    missing: List[str]  # Тикеры без данных
+    errors: Dict[str, str]  # Тикеры с ошибкой анализа
+    chart: Optional[bytes]  # Общий график прогнозов
+
+
+class AnalysisFlight:
+    """Выполняющийся анализ тикера, к которому присоединяются одинаковые запросы"""
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.started = asyncio.Event()  # Анализ получил слот исполнителя
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+
+    async def result(self) -> Optional[AnalysisResult]:
+        """
+        Ожидание результата
+
+        Отмена одного ожидающего запроса не отменяет анализ для остальных
+        """
+        return await asyncio.shield(self.task)
+
+
+class AnalysisService:
+    """
+    Анализ тикеров с объединением одновременных запросов
+
+    Запросы одного тикера за один день, пришедшие, пока анализ еще
+    выполняется, ждут тот же анализ (single-flight): данные загружаются
+    и модели обучаются один раз. От суммы инвестиции зависит только
+    расчет прибыли, он выполняется для каждого пользователя отдельно
+    """
+
+    def __init__(self, max_results: int = config.ANALYSIS_RESULTS_MAX_ENTRIES):
+        self.max_results = max_results
+        self._in_flight: Dict[Tuple[str, date], AnalysisFlight] = {}
+        # Завершенные анализы текущего дня (в том числе ночного прогрева)
+        self._results: 'OrderedDict[Tuple[str, date], AnalysisFlight]' = OrderedDict()
+
+    def submit(self, ticker: str, cpu_budget: Optional[int] = None) -> AnalysisFlight:
+        """
+        Запуск анализа или присоединение к уже выполняющемуся
+
+        Ключ — тикер и текущая дата биржи: в хранилище цен только
+        завершенные свечи, поэтому в течение дня данные тикера не меняются, и
+        завершенный сегодня анализ возвращается сразу
+
+        Args:
+            ticker: Тикер компании
+            cpu_budget: Ядер на обучение моделей (по умолчанию config.TRAINING_CPU_BUDGET)
+        """
+        key = (ticker, exchange_today())
+        flight = self._results.get(key) or self._in_flight.get(key)
+        if flight is None:
+            flight = AnalysisFlight(ticker)
+            flight.task = asyncio.ensure_future(self._run(flight, cpu_budget))
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+        elif flight.task.done():
+            self._results.move_to_end(key)
+            logger.info(f"Анализ {ticker} взят из готовых результатов")
+        else:
+            logger.info(f"Запрос {ticker} присоединен к выполняющемуся анализу")
+        flight.waiters += 1
+        return flight
+
+    def _finish(self, key: Tuple[str, date], flight: AnalysisFlight):
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+        if not flight.task.cancelled() and flight.task.exception() is None and flight.task.result() is not None:
+            self._results[key] = flight
+            # Результаты прошлых дней устарели, остальные вытесняются по LRU
+            for old_key in [k for k in self._results if k[1] != key[1]]:
+                del self._results[old_key]
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+        if flight.waiters > 1:
+            logger.info(f"Анализ {flight.ticker} выполнен один раз для {flight.waiters} запросов")
+
+    def in_flight(self) -> int:
+        """Количество выполняющихся анализов"""
+        return len(self._in_flight)
+
+    async def _run(self, flight: AnalysisFlight, cpu_budget: Optional[int] = None) -> Optional[AnalysisResult]:
+        """
+        Анализ тикера
+
+        Returns:
+            AnalysisResult или None, если данные не найдены
+        """
+        ticker = flight.ticker
+
+        async with analysis_executor.slot():
+            flight.started.set()
+
+            # Загрузка данных
+            data = await analysis_executor.run_io(DataService.load_stock_data, ticker)
+            if data is None:
+                return None
+
+            result = await self._analyze(ticker, data, cpu_budget)
+
+        logger.info(f"Очередь анализа: {analysis_executor.get_metrics()}")
+
+        return result
+
+    async def _run_batch(
+            self,
+            flights: Dict[str, AnalysisFlight],
+            cpu_budget: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Анализ тикеров пакета в одном слоте исполнителя
+
+        Returns:
+            Словарь {тикер: AnalysisResult, None (данные не найдены) или исключение}
+        """
+        async with analysis_executor.slot():
+            for flight in flights.values():
+                flight.started.set()
+
+            # Недостающие свечи всех тикеров загружаются одним запросом
+            datasets = await analysis_executor.run_io(DataService.load_many_stock_data, list(flights))
+            loaded = {ticker: data for ticker, data in datasets.items() if data is not None}
+            results = await asyncio.gather(
+                *(self._analyze(ticker, data, cpu_budget) for ticker, data in loaded.items()),
+                return_exceptions=True
+            )
+
+        logger.info(f"Очередь анализа: {analysis_executor.get_metrics()}")
+
+        return dict(zip(loaded, results))
+
+    @staticmethod
+    async def _batch_result(batch: asyncio.Task, ticker: str) -> Optional[AnalysisResult]:
+        """Результат одного тикера из пакетного анализа"""
+        outcome = (await batch).get(ticker)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    @classmethod
+    async def _analyze(cls, ticker: str, data: pd.DataFrame, cpu_budget: Optional[int]) -> AnalysisResult:
+        """Прогноз и график тикера"""
+        result = await cls._forecast(ticker, data, cpu_budget)
+
+        # Создание графика
+        chart = await analysis_executor.run_io(
+            VisualizationService.plot_prediction,
+            ticker, data, result.predictions, result.buy_days, result.sell_days
+        )
+        result.chart = chart.getvalue()
+        return result
+
+    @staticmethod
+    async def _forecast(ticker: str, data: pd.DataFrame, cpu_budget: Optional[int]) -> AnalysisResult:
+        """Обучение моделей (или модели из кэша и с диска), прогноз и торговые сигналы"""
+        cache_key = ModelCache.make_key(ticker, data)
+        prediction_service = await analysis_executor.run_io(model_cache.get, cache_key)
+        if prediction_service is not None:
+            logger.info(f"Модели {ticker} взяты из кэша")
+        else:
+            prediction_service = await analysis_executor.run_io(artifact_store.load, cache_key)
+            if prediction_service is not None:
+                logger.info(f"Модели {ticker} загружены с диска")
+            else:
+                # Модели по предыдущим свечам дообучаются, а не обучаются заново
+                previous = await analysis_executor.run_io(model_cache.get_latest, ticker)
+                if previous is None:
+                    previous = await analysis_executor.run_io(artifact_store.load_latest, ticker)
+                model_names, skipped = await analysis_executor.run_io(
+                    model_selection_policy.select, ticker
+                )
+                prediction_service = await AnalysisService._train(
+                    data, previous, model_names, skipped, cpu_budget
+                )
+                # Победы учитываются один раз на обучение, а не на ответ пользователю
+                model_selection_policy.record(
+                    ticker, prediction_service.best_model_name, prediction_service.results
+                )
+                await analysis_executor.run_io(artifact_store.save, cache_key, prediction_service)
+            await analysis_executor.run_io(model_cache.put, cache_key, prediction_service)
+
+        # Прогнозирование
+        predictions = await analysis_executor.run_io(
+            prediction_service.predict, config.FORECAST_DAYS
+        )
+
+        # Определение торговых сигналов
+        buy_days, sell_days = TradingSignals.find_extrema(predictions)
+
+        return AnalysisResult(
+            ticker=ticker,
+            data=data,
+            predictions=predictions,
+            results=prediction_service.get_results_summary(),
+            buy_days=buy_days,
+            sell_days=sell_days
+        )
+
+    @staticmethod
+    async def _train(
+            data: pd.DataFrame,
+            previous: Optional[PredictionService],
+            model_names: Optional[List[str]],
+            skipped: Optional[Dict[str, str]],
+            cpu_budget: Optional[int]
+    ) -> PredictionService:
+        """
+        Обучение моделей в пуле процессов AnalysisExecutor
+
+        При config.PARALLEL_TRAINING модели делятся на группы по числу
+        воркеров пула (но не больше ядер бюджета) с близкой стоимостью
+        обучения, и каждая группа обучается отдельной задачей. Если
+        группа получается одна, все модели обучаются последовательно в
+        одном воркере
+        """
+        if cpu_budget is None:
+            cpu_budget = get_cpu_budget()
+
+        prediction_service, incremental = plan_training(previous, model_names, skipped)
+        models = prediction_service.models
+        n_groups = min(len(models), cpu_budget, analysis_executor.process_workers)
+        if not config.PARALLEL_TRAINING or n_groups < 2:
+            if config.PARALLEL_TRAINING and len(models) > 1:
+                logger.info(
+                    f"Последовательное обучение {len(models)} моделей: ядер {cpu_budget}, "
+                    f"воркеров {analysis_executor.process_workers}"
+                )
+            return await analysis_executor.run_cpu(
+                train_prediction_service, data, previous, model_names, skipped, cpu_budget
+            )
+
+        groups = group_models(models, n_groups)
+        n_threads = max(1, cpu_budget // len(groups))
+        logger.info(
+            f"Параллельное обучение в {len(groups)} задачах "
+            f"({'; '.join(', '.join(group) for group in groups)}), {n_threads} потоков на задачу"
+        )
+
+        # Общий срок для всех моделей: время ответа ограничено сверху
+        deadline = get_deadline()
+        outcomes = await asyncio.gather(
+            *(
+                analysis_executor.run_cpu(
+                    train_models, group, data, config.TRAIN_SIZE, n_threads, incremental, deadline
+                )
+                for group in groups
+            ),
+            return_exceptions=True
+        )
+
+        trained = {}
+        for group, outcome in zip(groups, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Ошибка обучения {', '.join(group)}: {outcome}")
+                outcome = {name: (model, float('inf'), 0.0) for name, model in group.items()}
+            trained.update(outcome)
+        # Порядок моделей как в сервисе
+        prediction_service.apply_trained({name: trained[name] for name in models})
+        return prediction_service
+
+    async def analyze_batch(self, tickers: List[str], cpu_budget: Optional[int] = None) -> BatchAnalysisResult:
+        """
+        Пакетный анализ нескольких тикеров
+
+        Готовые сегодня и выполняющиеся анализы переиспользуются. Для
+        остальных тикеров недостающие свечи загружаются одним запросом,
+        а модели обучаются параллельно в пуле процессов в рамках одного
+        слота исполнителя. Эти анализы регистрируются как выполняющиеся
+        и сохраняются в готовые результаты, как в submit, поэтому
+        одиночные запросы тех же тикеров к ним присоединяются. Кроме
+        графиков тикеров строится один общий
+
+        Args:
+            tickers: Тикеры компаний
+            cpu_budget: Ядер на обучение моделей одного тикера
+        """
+        today = exchange_today()
+        flights: Dict[str, AnalysisFlight] = {}
+        pending: Dict[str, AnalysisFlight] = {}
+        for ticker in tickers:
+            if ticker in flights or ticker in pending:
+                continue
+            flight = self._results.get((ticker, today)) or self._in_flight.get((ticker, today))
+            if flight is not None:
+                flights[ticker] = flight
+            else:
+                pending[ticker] = AnalysisFlight(ticker)
+
+        if pending:
+            # Пакет выполняется отдельной задачей: отмена запроса не отменяет
+            # анализ для присоединившихся к нему
+            batch = asyncio.ensure_future(self._run_batch(pending, cpu_budget))
+            for ticker, flight in pending.items():
+                key = (ticker, today)
+                flight.task = asyncio.ensure_future(self._batch_result(batch, ticker))
+                self._in_flight[key] = flight
+                flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+            flights.update(pending)
+
+        outcomes: Dict[str, Any] = {}
+        for ticker, flight in flights.items():
+            flight.waiters += 1
+            try:
+                outcomes[ticker] = await flight.result()
+            except Exception as e:
+                outcomes[ticker] = e
+
+        results, missing, errors = {}, [], {}
+        for ticker in tickers:
+            outcome = outcomes.get(ticker)
+            if isinstance(outcome, Exception):
+                logger.error(f"Ошибка анализа {ticker}: {outcome}")
+                errors[ticker] = str(outcome)
+            elif outcome is None:
+                missing.append(ticker)
+            else:
+                results[ticker] = outcome
+
+        chart = None
+        if results:
+            buffer = await analysis_executor.run_io(
+                VisualizationService.plot_comparison,
+                {ticker: result.data for ticker, result in results.items()},
+                {ticker: result.predictions for ticker, result in results.items()}
+            )
+            chart = buffer.getvalue()
+
+        return BatchAnalysisResult(results=results, missing=missing, errors=errors, chart=chart)
+
+
+analysis_service = AnalysisService()
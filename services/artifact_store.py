@@ -0,0 +1,137 @@
+"""
+Хранилище обученных моделей на диске
+"""
+
+import logging
+import os
+import shutil
+import threading
+from typing import List, Optional
+from services.model_cache import CacheKey, training_config_hash
+from services.prediction_service import PredictionService
+from config import config
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Версионированный каталог обученных моделей
+
+    Версия моделей тикера — каталог с именем по ключу ModelCache:
+
+        {directory}/{ticker}/{дата последней свечи}_{хэш конфигурации}/
+            manifest.json
+            model_0/ ...
+
+    После перезапуска бота модели загружаются с диска вместо обучения,
+    а модели по предыдущим свечам дообучаются. Для тикера хранятся
+    config.ARTIFACT_KEEP_VERSIONS последних версий
+    """
+
+    def __init__(
+            self,
+            directory: str = config.ARTIFACT_DIR,
+            keep_versions: int = config.ARTIFACT_KEEP_VERSIONS,
+            enabled: bool = config.ARTIFACTS_ENABLED
+    ):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.directory, ticker)
+
+    def _path(self, key: CacheKey) -> str:
+        ticker, last_bar, config_hash = key
+        return os.path.join(self._ticker_dir(ticker), f'{last_bar}_{config_hash}')
+
+    def versions(self, ticker: str) -> List[CacheKey]:
+        """Сохраненные версии моделей тикера, от старых к новым"""
+        try:
+            names = os.listdir(self._ticker_dir(ticker))
+        except FileNotFoundError:
+            return []
+
+        keys = []
+        for name in names:
+            last_bar, sep, config_hash = name.partition('_')
+            # Пропускаем недописанные каталоги (*.tmp)
+            if sep and '.' not in config_hash:
+                keys.append((ticker, last_bar, config_hash))
+        return sorted(keys, key=lambda key: key[1])
+
+    def save(self, key: CacheKey, prediction_service: PredictionService) -> bool:
+        """
+        Атомарное сохранение моделей: запись во временный каталог и переименование
+
+        Returns:
+            True, если модели сохранены
+        """
+        if not self.enabled:
+            return False
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with span('artifact_save'):
+                os.makedirs(tmp_path)
+                prediction_service.save(tmp_path)
+                with self._lock:
+                    if os.path.exists(path):
+                        shutil.rmtree(path)
+                    os.replace(tmp_path, path)
+        except (OSError, ValueError, NotImplementedError) as e:
+            logger.warning(f"Не удалось сохранить модели {key[0]}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+        self._prune(key[0])
+        return True
+
+    def load(self, key: CacheKey) -> Optional[PredictionService]:
+        """
+        Загрузка моделей
+
+        Returns:
+            PredictionService или None, если версии нет или она не читается
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+
+        try:
+            with span('artifact_load'):
+                return PredictionService.load(path)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить модели {key[0]} ({key[1]}): {e}")
+            return None
+
+    def load_latest(self, ticker: str) -> Optional[PredictionService]:
+        """Самые свежие модели тикера, обученные с текущей конфигурацией"""
+        if not self.enabled:
+            return None
+
+        config_hash = training_config_hash()
+        keys = [key for key in self.versions(ticker) if key[2] == config_hash]
+        if not keys:
+            return None
+        return self.load(keys[-1])
+
+    def _prune(self, ticker: str):
+        """Удаление старых версий"""
+        with self._lock:
+            versions = self.versions(ticker)
+            for key in versions[:max(0, len(versions) - self.keep_versions)]:
+                try:
+                    shutil.rmtree(self._path(key))
+                except OSError as e:
+                    logger.warning(f"Не удалось удалить модели {ticker} ({key[1]}): {e}")
+
+
+artifact_store = ArtifactStore()
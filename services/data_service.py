@@ -3,8 +3,10 @@
 """
 
 import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from datetime import date, timedelta
+from services.price_store import price_store
+from utils.metrics import span
 from config import config
 import logging
 
@@ -26,19 +28,15 @@ class DataService:
             DataFrame с ценами закрытия или None при ошибке
         """
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=config.HISTORY_DAYS)
+            start_date = date.today() - timedelta(days=config.HISTORY_DAYS)
 
-            data = yf.download(ticker, start=start_date, end=end_date, progress=False)
+            with span('data_load'):
+                df = price_store.load(ticker, start_date)
 
-            if data.empty:
+            if df is None:
                 logger.error(f"Данные для {ticker} не найдены")
                 return None
 
-            # Извлекаем только цены закрытия
-            df = data[['Close']].copy()
-            df.columns = ['price']
-
             logger.info(f"Загружено {len(df)} записей для {ticker}")
             return df
 
@@ -47,8 +45,29 @@ class DataService:
             return None
 
     @staticmethod
-    def validate_ticker(ticker: str) -> bool:
-        """Проверка валидности тикера"""
-        if not ticker or len(ticker) > 10:
-            return False
-        return ticker.isalnum()
\ No newline at end of file
+    def load_many_stock_data(tickers: List[str]) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Загрузка исторических данных нескольких тикеров
+
+        Недостающие свечи всех тикеров загружаются одним запросом
+
+        Args:
+            tickers: Тикеры компаний
+
+        Returns:
+            Словарь {тикер: DataFrame с ценами закрытия или None}
+        """
+        try:
+            start_date = date.today() - timedelta(days=config.HISTORY_DAYS)
+
+            with span('data_load'):
+                data = price_store.load_many(tickers, start_date)
+
+            for ticker, df in data.items():
+                if df is None:
+                    logger.error(f"Данные для {ticker} не найдены")
+            return data
+
+        except Exception as e:
+            logger.error(f"Ошибка загрузки данных для {', '.join(tickers)}: {e}")
+            return {ticker: None for ticker in tickers}
\ No newline at end of file
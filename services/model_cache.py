@@ -0,0 +1,167 @@
+"""
+Кэш обученных моделей
+"""
+
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, Tuple
+import pandas as pd
+from config import config
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Параметры конфигурации, влияющие на обучение моделей
+_TRAINING_CONFIG_PREFIXES = ('HISTORY_', 'TRAIN_', 'LSTM_', 'RF_', 'ARIMA_', 'ENABLED_MODELS')
+
+CacheKey = Tuple[str, str, str]
+
+
+def training_config_hash() -> str:
+    """Хэш параметров обучения из конфигурации"""
+    params = {
+        name: value for name, value in sorted(asdict(config).items())
+        if name.startswith(_TRAINING_CONFIG_PREFIXES)
+    }
+    return hashlib.md5(repr(params).encode('utf-8')).hexdigest()[:12]
+
+
+class ModelCache:
+    """
+    LRU-кэш обученных PredictionService с TTL и ограничением памяти
+
+    Сервисы хранятся в сериализованном виде: так известен точный
+    объем занятой памяти, а каждый запрос получает свою копию моделей
+    """
+
+    def __init__(
+            self,
+            max_entries: int = config.MODEL_CACHE_MAX_ENTRIES,
+            ttl_seconds: float = config.MODEL_CACHE_TTL,
+            max_bytes: int = config.MODEL_CACHE_MAX_MB * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._entries: 'OrderedDict[CacheKey, Tuple[bytes, float]]' = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(ticker: str, data: pd.DataFrame) -> CacheKey:
+        """
+        Ключ кэша
+
+        Args:
+            ticker: Тикер компании
+            data: DataFrame с историческими данными
+
+        Returns:
+            Кортеж (тикер, дата последней свечи, хэш конфигурации)
+        """
+        last_bar = pd.Timestamp(data.index[-1]).strftime('%Y-%m-%d')
+        return ticker, last_bar, training_config_hash()
+
+    def get(self, key: CacheKey):
+        """
+        Получить обученный сервис из кэша
+
+        Returns:
+            PredictionService или None, если записи нет или она устарела
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            blob, created_at = entry
+            if time.monotonic() - created_at > self.ttl_seconds:
+                self._remove(key)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        with span('cache_load'):
+            return pickle.loads(blob)
+
+    def get_latest(self, ticker: str):
+        """
+        Самые свежие модели тикера для дообучения на новых свечах
+
+        Returns:
+            PredictionService, обученный с текущей конфигурацией, или None
+        """
+        config_hash = training_config_hash()
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[0] == ticker and key[2] == config_hash
+            ]
+        if not keys:
+            return None
+        return self.get(max(keys, key=lambda key: key[1]))
+
+    def put(self, key: CacheKey, prediction_service):
+        """Сохранить обученный сервис в кэш"""
+        with span('cache_store'):
+            blob = pickle.dumps(prediction_service, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if len(blob) > self.max_bytes:
+            logger.warning(f"Модели {key[0]} не помещаются в кэш ({len(blob)} байт)")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (blob, time.monotonic())
+            self._total_bytes += len(blob)
+            self._evict()
+
+    def _remove(self, key: CacheKey):
+        """Удаление записи (вызывается под блокировкой)"""
+        blob, _ = self._entries.pop(key)
+        self._total_bytes -= len(blob)
+
+    def _evict(self):
+        """Вытеснение устаревших и давно не использованных записей"""
+        now = time.monotonic()
+        expired = [
+            key for key, (_, created_at) in self._entries.items()
+            if now - created_at > self.ttl_seconds
+        ]
+        for key in expired:
+            self._remove(key)
+
+        while self._entries and (
+                len(self._entries) > self.max_entries
+                or self._total_bytes > self.max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            logger.info(f"Из кэша вытеснены модели {key[0]} ({key[1]})")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Получить статистику кэша"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+model_cache = ModelCache()
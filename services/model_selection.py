@@ -0,0 +1,129 @@
+"""
+Выбор моделей для обучения с учетом стоимости
+"""
+
+import logging
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+from models.registry import model_registry
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSelectionPolicy:
+    """
+    Политика выбора моделей
+
+    Дорогие модели (стоимость >= config.MODEL_SKIP_MIN_COST) пропускаются,
+    если дешевая модель выигрывает на тикере не реже
+    config.MODEL_SKIP_WIN_RATE. Кроме того, суммарная стоимость моделей
+    ограничивается config.MODEL_COST_BUDGET (0 — без ограничения).
+
+    Победы считаются только по обучениям, в которых участвовали все
+    включенные модели: иначе пропущенная модель не смогла бы вернуть
+    себе долю побед. Старые обучения учитываются с весом
+    config.MODEL_SKIP_DECAY на каждое новое, а каждое
+    config.MODEL_SKIP_RECHECK_EVERY-е обучение с пропуском заменяется
+    полным, чтобы пропущенные модели оценивались заново
+    """
+
+    def __init__(self):
+        self._ticker_wins: Counter = Counter()
+        self._ticker_trainings: Counter = Counter()
+        self._skipped_trainings: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, ticker: str, best_model: str, results: Dict[str, float]):
+        """
+        Учет результата обучения
+
+        Вызывается один раз на обучение моделей, а не на ответ
+        пользователю: результаты из кэша и общих анализов не учитываются
+
+        Args:
+            ticker: Тикер компании
+            best_model: Лучшая модель
+            results: RMSE обученных моделей {модель: RMSE}
+        """
+        enabled = [spec.name for spec in model_registry.enabled()]
+        if not all(math.isfinite(results.get(name, math.inf)) for name in enabled):
+            return
+
+        with self._lock:
+            for key in [key for key in self._ticker_wins if key[0] == ticker]:
+                self._ticker_wins[key] *= config.MODEL_SKIP_DECAY
+            self._ticker_trainings[ticker] *= config.MODEL_SKIP_DECAY
+
+            self._ticker_wins[(ticker, best_model)] += 1
+            self._ticker_trainings[ticker] += 1
+
+    def win_rate(self, ticker: str, model: str) -> Tuple[float, float]:
+        """
+        Доля побед модели на тикере
+
+        Returns:
+            Кортеж (доля побед, взвешенное число полных обучений по тикеру)
+        """
+        with self._lock:
+            trainings = self._ticker_trainings.get(ticker, 0)
+            if trainings == 0:
+                return 0.0, 0
+            return self._ticker_wins.get((ticker, model), 0) / trainings, trainings
+
+    def select(self, ticker: str) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Выбор моделей для очередного обучения на тикере
+
+        Returns:
+            Кортеж (модели для обучения, {пропущенная модель: причина})
+        """
+        specs = model_registry.enabled()
+        skipped: Dict[str, str] = {}
+
+        cheap = [spec for spec in specs if spec.cost < config.MODEL_SKIP_MIN_COST]
+        dominant = None
+        for spec in cheap:
+            rate, trainings = self.win_rate(ticker, spec.name)
+            if trainings >= config.MODEL_SKIP_MIN_REQUESTS and rate >= config.MODEL_SKIP_WIN_RATE:
+                dominant = (spec.name, rate)
+                break
+
+        if dominant is not None:
+            with self._lock:
+                self._skipped_trainings[ticker] += 1
+                recheck = self._skipped_trainings[ticker] >= config.MODEL_SKIP_RECHECK_EVERY
+                if recheck:
+                    self._skipped_trainings[ticker] = 0
+            if recheck:
+                logger.info(f"{ticker}: перепроверка пропускаемых моделей, обучаются все")
+                dominant = None
+
+        selected = []
+        for spec in specs:
+            if dominant is not None and spec.cost >= config.MODEL_SKIP_MIN_COST:
+                skipped[spec.name] = f"{dominant[0]} побеждает в {dominant[1] * 100:.0f}% обучений"
+            else:
+                selected.append(spec)
+
+        # Бюджет стоимости: сначала дешевые модели, хотя бы одна модель обучается
+        if config.MODEL_COST_BUDGET > 0:
+            total_cost = 0.0
+            within_budget = set()
+            for spec in sorted(selected, key=lambda s: s.cost):
+                if within_budget and total_cost + spec.cost > config.MODEL_COST_BUDGET:
+                    skipped[spec.name] = "превышен бюджет стоимости"
+                    continue
+                total_cost += spec.cost
+                within_budget.add(spec.name)
+            selected = [spec for spec in selected if spec.name in within_budget]
+
+        if skipped:
+            logger.info(f"{ticker}: пропущены модели {skipped}")
+
+        return [spec.name for spec in selected], skipped
+
+
+model_selection_policy = ModelSelectionPolicy()
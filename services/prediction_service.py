@@ -2,56 +2,217 @@
 Сервис для прогнозирования цен акций
 """
 
+import json
+import os
+import time
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional
-from models.random_forest import RandomForestModel
-from models.arima_model import ARIMAModel
-from models.lstm_model import LSTMModel
+from threadpoolctl import threadpool_limits
+from typing import Any, Dict, List, Tuple, Optional
+from models.artifacts import ARTIFACT_FORMAT
 from models.base_model import BaseModel
+from models.registry import model_registry
 from config import config
+from utils.metrics import span
 import logging
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILE = 'manifest.json'
+
+TrainedModel = Tuple[BaseModel, float, float]
+
+
+def get_cpu_budget() -> int:
+    """Количество ядер, доступных одному анализу"""
+    if config.TRAINING_CPU_BUDGET > 0:
+        return config.TRAINING_CPU_BUDGET
+    return max(1, (os.cpu_count() or 1) // max(1, config.ANALYSIS_PROCESS_WORKERS))
+
+
+def get_deadline() -> Optional[float]:
+    """
+    Момент time.monotonic(), к которому нужно завершить обучение моделей
+
+    Часы time.monotonic() общие для процессов одной машины, поэтому
+    deadline можно передавать в процессы-воркеры
+    """
+    if config.TRAINING_DEADLINE > 0:
+        return time.monotonic() + config.TRAINING_DEADLINE
+    return None
+
+
+def train_model(
+        model: BaseModel,
+        data: pd.DataFrame,
+        train_size: float,
+        n_threads: int,
+        incremental: bool = False,
+        deadline: Optional[float] = None
+) -> TrainedModel:
+    """
+    Обучение одной модели с ограничением потоков (точка входа для пула процессов)
+
+    Args:
+        incremental: Дообучить уже обученную модель (BaseModel.update)
+        deadline: Момент time.monotonic(), к которому обучение нужно завершить
+
+    Returns:
+        Кортеж (обученная модель, RMSE, время обучения в секундах)
+    """
+    start = time.perf_counter()
+    model.set_cpu_budget(n_threads)
+    # Ограничиваем BLAS/OpenMP, чтобы модели не отнимали ядра друг у друга
+    with threadpool_limits(limits=n_threads), span('model_train', model=model.get_name()):
+        try:
+            if incremental:
+                rmse = model.update(data, train_size=train_size, deadline=deadline)
+            else:
+                rmse = model.train(data, train_size=train_size, deadline=deadline)
+        except Exception as e:
+            logger.error(f"Ошибка обучения {model.get_name()}: {e}")
+            rmse = float('inf')
+    return model, rmse, time.perf_counter() - start
+
+
+def train_models(
+        models: Dict[str, BaseModel],
+        data: pd.DataFrame,
+        train_size: float,
+        n_threads: int,
+        incremental: bool = False,
+        deadline: Optional[float] = None
+) -> Dict[str, TrainedModel]:
+    """
+    Последовательное обучение группы моделей (точка входа для пула процессов)
+
+    Returns:
+        Словарь {название_модели: результат train_model}
+    """
+    trained = {}
+    for name, model in models.items():
+        logger.info(f"Обучение модели {name}...")
+        trained[name] = train_model(model, data, train_size, n_threads, incremental, deadline)
+    return trained
+
+
+def group_models(models: Dict[str, BaseModel], n_groups: int) -> List[Dict[str, BaseModel]]:
+    """
+    Разбиение моделей на группы с близкой суммарной стоимостью обучения
+
+    Модели распределяются от дорогих к дешевым (ModelSpec.cost), каждая
+    в наименее загруженную группу: при стоимостях LSTM 10, Random Forest
+    и ARIMA по 1 и двух группах LSTM обучается отдельно от остальных
+    """
+    groups: List[Dict[str, BaseModel]] = [{} for _ in range(min(n_groups, len(models)))]
+    costs = [0.0] * len(groups)
+    for name in sorted(models, key=lambda name: model_registry.get(name).cost, reverse=True):
+        i = costs.index(min(costs))
+        groups[i][name] = models[name]
+        costs[i] += model_registry.get(name).cost
+    return groups
+
 
 class PredictionService:
     """Сервис для обучения моделей и прогнозирования"""
 
-    def __init__(self):
-        self.models = {
-            'Random Forest': RandomForestModel(),
-            'ARIMA': ARIMAModel(),
-            'LSTM': LSTMModel()
-        }
+    def __init__(self, model_names: Optional[List[str]] = None, skipped: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            model_names: Модели для обучения (по умолчанию включенные в config.ENABLED_MODELS)
+            skipped: Пропущенные модели с причинами для сводки результатов
+        """
+        if model_names is None:
+            model_names = [spec.name for spec in model_registry.enabled()]
+        if not model_names:
+            raise ValueError("Не выбрано ни одной модели")
+
+        self.models = {name: model_registry.create(name) for name in model_names}
+        self.skipped: Dict[str, str] = skipped or {}
         self.best_model_name: Optional[str] = None
         self.best_rmse: float = float('inf')
         self.results: Dict[str, float] = {}
+        self.timings: Dict[str, float] = {}
+        self.budgets: Dict[str, Dict[str, Any]] = {}
 
-    def train_all_models(self, data: pd.DataFrame) -> Dict[str, float]:
+    def train_all_models(self, data: pd.DataFrame, cpu_budget: Optional[int] = None) -> Dict[str, float]:
         """
-        Обучение всех моделей
+        Последовательное обучение всех моделей в текущем процессе
+
+        Параллельное обучение моделей в пуле процессов выполняет
+        AnalysisService через AnalysisExecutor
 
         Args:
             data: DataFrame с историческими данными
+            cpu_budget: Ядер на обучение (по умолчанию config.TRAINING_CPU_BUDGET)
 
         Returns:
             Словарь {название_модели: RMSE}
         """
-        results = {}
+        return self._fit_all_models(data, incremental=False, cpu_budget=cpu_budget)
+
+    def update_all_models(self, data: pd.DataFrame, cpu_budget: Optional[int] = None) -> Dict[str, float]:
+        """
+        Обновление обученных моделей на данных с новыми свечами
+
+        Модели с поддержкой дообучения (ARIMA) используют текущие параметры
+        как стартовые, остальные обучаются заново
+
+        Args:
+            data: DataFrame с историческими данными
+            cpu_budget: Ядер на обучение (по умолчанию config.TRAINING_CPU_BUDGET)
+
+        Returns:
+            Словарь {название_модели: RMSE}
+        """
+        return self._fit_all_models(data, incremental=True, cpu_budget=cpu_budget)
+
+    def _fit_all_models(
+            self,
+            data: pd.DataFrame,
+            incremental: bool,
+            cpu_budget: Optional[int] = None
+    ) -> Dict[str, float]:
+        """Обучение или обновление всех моделей и выбор лучшей"""
+        if cpu_budget is None:
+            cpu_budget = get_cpu_budget()
 
-        for name, model in self.models.items():
-            logger.info(f"Обучение модели {name}...")
-            try:
-                rmse = model.train(data, train_size=config.TRAIN_SIZE)
-                results[name] = rmse
-                logger.info(f"{name}: RMSE = {rmse:.2f}")
-            except Exception as e:
-                logger.error(f"Ошибка обучения {name}: {e}")
-                results[name] = float('inf')
+        # Общий срок для всех моделей: время ответа ограничено сверху
+        deadline = get_deadline()
+
+        trained = train_models(self.models, data, config.TRAIN_SIZE, cpu_budget, incremental, deadline)
+        return self.apply_trained(trained)
+
+    def apply_trained(self, trained: Dict[str, TrainedModel]) -> Dict[str, float]:
+        """
+        Результаты обучения моделей (train_model) и выбор лучшей
+
+        Args:
+            trained: Словарь {название_модели: результат train_model}
+
+        Returns:
+            Словарь {название_модели: RMSE}
+        """
+        results = {}
+        timings = {}
+        budgets = {}
+        for name, (model, rmse, elapsed) in trained.items():
+            self.models[name] = model
+            results[name] = rmse
+            timings[name] = elapsed
+            budget = budgets[name] = model.budget_used
+            if budget:
+                logger.info(
+                    f"{name}: RMSE = {rmse:.2f} ({elapsed:.1f} с, "
+                    f"{budget['unit']}: {budget['used']}/{budget['limit']}, {budget['stopped']})"
+                )
+            else:
+                logger.info(f"{name}: RMSE = {rmse:.2f} ({elapsed:.1f} с)")
 
         # Выбор лучшей модели
         self.results = results
+        self.timings = timings
+        self.budgets = budgets
         self.best_model_name = min(results.keys(), key=lambda k: results[k])
         self.best_rmse = results[self.best_model_name]
 
@@ -76,13 +237,128 @@ class PredictionService:
             Массив прогнозируемых цен
         """
         best_model = self.get_best_model()
-        predictions = best_model.predict(steps)
+        with span('model_predict', model=best_model.get_name()):
+            predictions = best_model.predict(steps)
         return predictions
 
+    def save(self, directory: str):
+        """
+        Сохранение моделей и результатов выбора лучшей
+
+        Каждая обученная модель сохраняется в свой подкаталог,
+        manifest.json связывает названия моделей с подкаталогами
+
+        Args:
+            directory: Существующий пустой каталог
+        """
+        models = {}
+        for i, (name, model) in enumerate(self.models.items()):
+            if not model.is_trained():
+                models[name] = None
+                continue
+            subdir = f'model_{i}'
+            os.makedirs(os.path.join(directory, subdir))
+            model.save(os.path.join(directory, subdir))
+            models[name] = subdir
+
+        manifest = {
+            'format': ARTIFACT_FORMAT,
+            'models': models,
+            'best_model': self.best_model_name,
+            'best_rmse': self.best_rmse,
+            'results': self.results,
+            'timings': self.timings,
+            'budgets': self.budgets,
+            'skipped': self.skipped
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, directory: str) -> 'PredictionService':
+        """
+        Загрузка сервиса, сохраненного save
+
+        Raises:
+            ValueError: Артефакт поврежден или сохранен в другом формате
+        """
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Не удалось прочитать {directory}: {e}") from e
+        if manifest.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Формат артефакта {manifest.get('format')}, ожидается {ARTIFACT_FORMAT}")
+
+        service = cls(list(manifest['models']), manifest['skipped'])
+        for name, subdir in manifest['models'].items():
+            if subdir is not None:
+                service.models[name].load(os.path.join(directory, subdir))
+
+        service.best_model_name = manifest['best_model']
+        service.best_rmse = manifest['best_rmse']
+        service.results = manifest['results']
+        service.timings = manifest['timings']
+        service.budgets = manifest['budgets']
+        return service
+
     def get_results_summary(self) -> Dict[str, any]:
         """Получить сводку результатов"""
         return {
             'best_model': self.best_model_name,
             'best_rmse': self.best_rmse,
-            'all_results': self.results
-        }
\ No newline at end of file
+            'all_results': self.results,
+            'timings': self.timings,
+            'budgets': self.budgets,
+            'skipped': self.skipped
+        }
+
+
+def plan_training(
+        previous: Optional[PredictionService] = None,
+        model_names: Optional[List[str]] = None,
+        skipped: Optional[Dict[str, str]] = None
+) -> Tuple[PredictionService, bool]:
+    """
+    Сервис для обучения: дообучение прежних моделей или новые модели
+
+    Args:
+        previous: Ранее обученный сервис того же тикера
+        model_names: Модели для обучения (по умолчанию все включенные)
+        skipped: Пропущенные модели с причинами
+
+    Returns:
+        Кортеж (PredictionService, дообучать ли модели)
+    """
+    if previous is not None and (model_names is None or set(model_names) == set(previous.models)):
+        previous.skipped = skipped or {}
+        return previous, True
+    return PredictionService(model_names, skipped), False
+
+
+def train_prediction_service(
+        data: pd.DataFrame,
+        previous: Optional[PredictionService] = None,
+        model_names: Optional[List[str]] = None,
+        skipped: Optional[Dict[str, str]] = None,
+        cpu_budget: Optional[int] = None
+) -> PredictionService:
+    """
+    Последовательное обучение всех моделей (точка входа для пула процессов)
+
+    Args:
+        data: DataFrame с историческими данными
+        previous: Ранее обученный сервис того же тикера для дообучения
+        model_names: Модели для обучения (по умолчанию все включенные)
+        skipped: Пропущенные модели с причинами
+        cpu_budget: Ядер на обучение (по умолчанию config.TRAINING_CPU_BUDGET)
+
+    Returns:
+        Обученный PredictionService
+    """
+    prediction_service, incremental = plan_training(previous, model_names, skipped)
+    if incremental:
+        prediction_service.update_all_models(data, cpu_budget=cpu_budget)
+    else:
+        prediction_service.train_all_models(data, cpu_budget=cpu_budget)
+    return prediction_service
@@ -0,0 +1,344 @@
+"""
+Локальное хранилище исторических цен
+"""
+
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+from config import config
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Формат хранения: дата (datetime64[ns] как int64) и цена закрытия
+PRICE_DTYPE = np.dtype([('date', '<i8'), ('price', '<f8')])
+
+
+def exchange_today() -> date:
+    """
+    Текущая дата биржи (config.EXCHANGE_TIMEZONE)
+
+    Свечи до этой даты завершены. Дата сервера восточнее Нью-Йорка
+    меняется до закрытия торгов, и по ней загружалась бы свеча еще
+    идущей сессии, которую _merge потом не заменяет
+    """
+    return datetime.now(ZoneInfo(config.EXCHANGE_TIMEZONE)).date()
+
+
+class PriceSource(ABC):
+    """Источник исторических цен"""
+
+    @abstractmethod
+    def fetch(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        """
+        Загрузка цен закрытия
+
+        Args:
+            ticker: Тикер компании
+            start: Первая дата (включительно)
+            end: Последняя дата (не включительно)
+
+        Returns:
+            DataFrame с колонкой price и DatetimeIndex (может быть пустым)
+        """
+        pass
+
+    def fetch_many(self, tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        """
+        Загрузка цен закрытия нескольких тикеров
+
+        По умолчанию тикеры загружаются по одному
+
+        Returns:
+            Словарь {тикер: DataFrame с колонкой price}
+        """
+        return {ticker: self.fetch(ticker, start, end) for ticker in tickers}
+
+
+class YFinanceSource(PriceSource):
+    """Загрузка цен из Yahoo Finance"""
+
+    def fetch(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        import yfinance as yf
+
+        data = yf.download(ticker, start=start, end=end, progress=False)
+
+        if data.empty:
+            return pd.DataFrame(columns=['price'], dtype=float)
+
+        # Извлекаем только цены закрытия
+        df = data[['Close']].copy()
+        df.columns = ['price']
+        return df
+
+    def fetch_many(self, tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        """Загрузка всех тикеров одним запросом"""
+        import yfinance as yf
+
+        data = yf.download(tickers, start=start, end=end, progress=False, group_by='column')
+
+        result = {}
+        for ticker in tickers:
+            if data.empty or ticker not in data['Close']:
+                result[ticker] = pd.DataFrame(columns=['price'], dtype=float)
+                continue
+            df = data['Close'][[ticker]].copy()
+            df.columns = ['price']
+            result[ticker] = df
+        return result
+
+
+class CsvPriceSource(PriceSource):
+    """Загрузка цен из локальных CSV-файлов {TICKER}.csv с колонками date, price"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        path = os.path.join(self.directory, f'{ticker}.csv')
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=['price'], dtype=float)
+
+        df = pd.read_csv(path, index_col='date', parse_dates=True)[['price']]
+        return df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+
+def create_price_source() -> PriceSource:
+    """Создание источника цен по конфигурации"""
+    if config.PRICE_SOURCE == 'csv':
+        return CsvPriceSource(config.PRICE_SOURCE_DIR)
+    return YFinanceSource()
+
+
+class PriceStore:
+    """
+    Хранилище цен закрытия: один memory-mapped .npy файл на тикер
+
+    Хранятся только завершенные дневные свечи. При запросе догружается
+    лишь недостающий хвост после последней сохраненной свечи, а если
+    хранилище уже обновлялось сегодня, сеть не используется. Рядом с
+    ценами ({TICKER}.start) хранится дата, с которой история тикера
+    запрашивалась у источника: у недавно размещенных акций история
+    начинается позже нее и не загружается заново при каждом запросе
+    """
+
+    def __init__(self, directory: str = config.PRICE_STORE_DIR, source: Optional[PriceSource] = None):
+        self.directory = directory
+        self.source = source or create_price_source()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f'{ticker}.npy')
+
+    def _history_start_path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f'{ticker}.start')
+
+    def _history_start(self, ticker: str) -> Optional[date]:
+        """Самая ранняя дата, с которой история тикера запрашивалась у источника"""
+        try:
+            with open(self._history_start_path(ticker)) as f:
+                return date.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _set_history_start(self, ticker: str, start: date):
+        """Атомарная запись даты начала загруженной истории"""
+        path = self._history_start_path(ticker)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(start.isoformat())
+        os.replace(tmp_path, path)
+
+    def read(self, ticker: str) -> Optional[np.ndarray]:
+        """Чтение сохраненных цен (memory-mapped, только для чтения)"""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def _write(self, ticker: str, records: np.ndarray):
+        """Атомарная запись цен"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(ticker)
+        # Тикер могут одновременно обновлять несколько потоков процесса
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_path, path)
+
+    def _is_fresh(self, ticker: str) -> bool:
+        """Обновлялось ли хранилище тикера сегодня (по дате биржи)"""
+        mtime = os.path.getmtime(self._path(ticker))
+        return datetime.fromtimestamp(mtime, ZoneInfo(config.EXCHANGE_TIMEZONE)).date() == exchange_today()
+
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> np.ndarray:
+        records = np.empty(len(df), dtype=PRICE_DTYPE)
+        records['date'] = pd.DatetimeIndex(df.index).tz_localize(None).values.astype('datetime64[ns]').view('i8')
+        records['price'] = df['price'].to_numpy(dtype=float)
+        return records
+
+    @staticmethod
+    def _to_frame(records: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(
+            {'price': np.array(records['price'])},
+            index=pd.DatetimeIndex(np.array(records['date']).view('datetime64[ns]'), name='Date')
+        )
+
+    def _plan(self, ticker: str, start: date) -> Tuple[Optional[np.ndarray], Optional[date]]:
+        """
+        Что нужно догрузить для тикера
+
+        Returns:
+            Кортеж (сохраненные цены, первая дата для загрузки). Дата None —
+            хранилище уже обновлялось сегодня и загрузка не нужна
+        """
+        stored = self.read(ticker)
+
+        if stored is not None and len(stored) > 0:
+            first_date = pd.Timestamp(int(stored['date'][0])).date()
+            history_start = self._history_start(ticker)
+            # Допуск на выходные и праздники в начале истории. Если история
+            # уже запрашивалась с этой даты или раньше, более ранних свечей
+            # у источника нет
+            covers_start = (
+                first_date <= start + timedelta(days=7)
+                or (history_start is not None and history_start <= start)
+            )
+            if covers_start and self._is_fresh(ticker):
+                return stored, None
+
+            if covers_start:
+                # Догружаем только хвост после последней свечи
+                fetch_start = pd.Timestamp(int(stored['date'][-1])).date() + timedelta(days=1)
+                # Копия в памяти освобождает файл для перезаписи
+                return np.array(stored), fetch_start
+
+        # Данных нет или запрошена более длинная история: загружаем заново
+        return None, start
+
+    def _merge(
+            self,
+            ticker: str,
+            stored: Optional[np.ndarray],
+            new_data: pd.DataFrame,
+            fetch_start: date
+    ) -> Optional[np.ndarray]:
+        """
+        Добавление загруженных свечей к сохраненным
+
+        Args:
+            fetch_start: Первая дата загруженного диапазона (до сегодня).
+                При загрузке истории заново запоминается как ее начало
+
+        Returns:
+            Все сохраненные цены тикера или None, если данных нет
+        """
+        new_records = self._to_records(new_data.dropna())
+        if stored is not None:
+            new_records = new_records[new_records['date'] > stored['date'][-1]]
+        logger.info(f"Догружено {len(new_records)} записей для {ticker}")
+
+        if stored is None:
+            if len(new_records) == 0:
+                return None
+            self._write(ticker, new_records)
+            self._set_history_start(ticker, fetch_start)
+        elif len(new_records) > 0:
+            self._write(ticker, np.concatenate([stored, new_records]))
+        elif np.busday_count(fetch_start, exchange_today()) == 0:
+            # В диапазоне только выходные: новых свечей и не будет, отмечаем проверку
+            os.utime(self._path(ticker))
+        else:
+            # Yahoo сообщает о сбоях сети и лимитах пустым ответом, поэтому
+            # хранилище не помечается свежим и следующий запрос повторит загрузку.
+            # В биржевые праздники это лишний запрос, но не устаревшие данные
+            logger.warning(f"Нет новых свечей {ticker} за рабочие дни с {fetch_start}")
+
+        return self.read(ticker)
+
+    def update(self, ticker: str, start: date) -> Optional[np.ndarray]:
+        """
+        Догрузка недостающих свечей
+
+        Args:
+            ticker: Тикер компании
+            start: Первая нужная дата истории
+
+        Returns:
+            Все сохраненные цены тикера или None, если данных нет
+        """
+        return self.update_many([ticker], start)[ticker]
+
+    def update_many(self, tickers: List[str], start: date) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Догрузка недостающих свечей нескольких тикеров одним запросом к источнику
+
+        Returns:
+            Словарь {тикер: все сохраненные цены или None}
+        """
+        today = exchange_today()
+        plans = {ticker: self._plan(ticker, start) for ticker in tickers}
+
+        stale = [
+            ticker for ticker, (_, fetch_start) in plans.items()
+            if fetch_start is not None and fetch_start < today
+        ]
+        fetched = {}
+        if len(stale) == 1:
+            with span('data_download'):
+                fetched[stale[0]] = self.source.fetch(stale[0], plans[stale[0]][1], today)
+        elif stale:
+            # Общий запрос с самой ранней нужной даты, лишнее отсекается в _merge
+            fetch_start = min(plans[ticker][1] for ticker in stale)
+            with span('data_download'):
+                fetched = self.source.fetch_many(stale, fetch_start, today)
+
+        result = {}
+        for ticker, (stored, fetch_start) in plans.items():
+            if fetch_start is None:
+                result[ticker] = stored
+            else:
+                empty = pd.DataFrame(columns=['price'], dtype=float)
+                result[ticker] = self._merge(ticker, stored, fetched.get(ticker, empty), fetch_start)
+        return result
+
+    def _window(self, records: Optional[np.ndarray], start: date) -> Optional[pd.DataFrame]:
+        """Цены начиная с даты start"""
+        if records is None:
+            return None
+
+        start_ns = np.datetime64(start, 'ns').astype('i8')
+        window = records[records['date'] >= start_ns]
+        if len(window) == 0:
+            return None
+        return self._to_frame(window)
+
+    def load(self, ticker: str, start: date) -> Optional[pd.DataFrame]:
+        """
+        Цены закрытия тикера начиная с даты start
+
+        Returns:
+            DataFrame с колонкой price или None, если данных нет
+        """
+        return self._window(self.update(ticker, start), start)
+
+    def load_many(self, tickers: List[str], start: date) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Цены закрытия нескольких тикеров начиная с даты start
+
+        Returns:
+            Словарь {тикер: DataFrame с колонкой price или None}
+        """
+        return {
+            ticker: self._window(records, start)
+            for ticker, records in self.update_many(tickers, start).items()
+        }
+
+
+price_store = PriceStore()
@@ -0,0 +1,88 @@
+"""
+Ночной прогрев моделей популярных тикеров
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+from services.analysis_executor import analysis_executor
+from services.stats_service import StatsService
+from utils.warmup import import_modules
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед следующим тикером, пока пользовательские запросы ждут в очереди
+_YIELD_INTERVAL = 5.0
+
+
+class PrewarmScheduler:
+    """
+    Ежедневный прогрев: обновление цен, обучение моделей, прогноз и график
+    для списка популярных тикеров вне торговой сессии
+
+    Результаты попадают в кэш моделей и в готовые анализы AnalysisService,
+    поэтому дневные запросы по этим тикерам отвечают сразу. Тикеры
+    обрабатываются по одному с ограниченным числом ядер и уступают
+    очередь пользовательским запросам
+    """
+
+    JOB_NAME = 'nightly-prewarm'
+
+    @staticmethod
+    def get_watchlist() -> List[str]:
+        """Тикеры из config.PREWARM_TICKERS и самые запрашиваемые из журнала"""
+        hot_tickers = StatsService.get_prewarm_list(config.STATS_HOT_TICKERS)
+        return list(dict.fromkeys([*config.PREWARM_TICKERS, *hot_tickers]))
+
+    @staticmethod
+    async def run(context=None) -> Dict[str, str]:
+        """
+        Прогрев списка тикеров (callback для JobQueue)
+
+        Returns:
+            Словарь {тикер: 'ok' или описание ошибки}
+        """
+        await analysis_executor.run_io(import_modules)
+        from services.analysis_service import analysis_service
+
+        watchlist = await analysis_executor.run_io(PrewarmScheduler.get_watchlist)
+        logger.info(f"Прогрев {len(watchlist)} тикеров: {', '.join(watchlist)}")
+
+        start = time.perf_counter()
+        status = {}
+        for ticker in watchlist:
+            # Пользовательские запросы важнее прогрева
+            while analysis_executor.queue_position() > 0:
+                await asyncio.sleep(_YIELD_INTERVAL)
+
+            try:
+                flight = analysis_service.submit(ticker, cpu_budget=config.PREWARM_CPU_BUDGET)
+                result = await flight.result()
+                status[ticker] = 'ok' if result is not None else 'нет данных'
+            except Exception as e:
+                logger.error(f"Ошибка прогрева {ticker}: {e}")
+                status[ticker] = str(e)
+
+        failed = sum(1 for value in status.values() if value != 'ok')
+        logger.info(
+            f"Прогрев завершен за {time.perf_counter() - start:.0f} с, "
+            f"тикеров: {len(status)}, ошибок: {failed}"
+        )
+        return status
+
+    @staticmethod
+    def schedule(job_queue):
+        """
+        Ежедневный запуск прогрева в config.PREWARM_TIME
+
+        Args:
+            job_queue: JobQueue приложения python-telegram-bot
+        """
+        run_at = datetime.strptime(config.PREWARM_TIME, '%H:%M').time()
+        # Время задается в часовом поясе сервера
+        run_at = run_at.replace(tzinfo=datetime.now().astimezone().tzinfo)
+        job_queue.run_daily(PrewarmScheduler.run, time=run_at, name=PrewarmScheduler.JOB_NAME)
+        logger.info(f"Ночной прогрев запланирован на {config.PREWARM_TIME}")
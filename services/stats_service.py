@@ -0,0 +1,232 @@
+"""
+Сервис аналитики по журналу запросов
+"""
+
+import json
+import logging
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Гистограмма RMSE: логарифмические корзины от 1e-3 до 1e5, 20 на декаду
+_RMSE_MIN_EXP = -3
+_RMSE_MAX_EXP = 5
+_RMSE_BINS_PER_DECADE = 20
+_RMSE_BINS = (_RMSE_MAX_EXP - _RMSE_MIN_EXP) * _RMSE_BINS_PER_DECADE
+
+# Размер пачки строк при чтении журнала
+_READ_CHUNK_BYTES = 1024 * 1024
+
+
+class TopK:
+    """
+    Приближенный подсчет самых частых ключей (алгоритм Misra-Gries)
+
+    Хранит не более capacity счетчиков независимо от числа ключей.
+    Счетчики занижены не более чем на total / capacity
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, key: str):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            # Уменьшаем все счетчики: суммарно не дороже числа добавлений
+            for other in list(self.counts):
+                if self.counts[other] == 1:
+                    del self.counts[other]
+                else:
+                    self.counts[other] -= 1
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+@dataclass
+class RequestStats:
+    """Агрегированная статистика запросов"""
+
+    total: int = 0
+    skipped_lines: int = 0
+    ticker_counts: Counter = field(default_factory=Counter)
+    model_wins: Counter = field(default_factory=Counter)
+    ticker_model_wins: Counter = field(default_factory=Counter)
+    users: TopK = field(default_factory=lambda: TopK(config.STATS_TOP_USERS_CAPACITY))
+
+    # Распределение RMSE (Уэлфорд + логарифмическая гистограмма)
+    rmse_count: int = 0
+    rmse_mean: float = 0.0
+    rmse_m2: float = 0.0
+    rmse_min: float = math.inf
+    rmse_max: float = 0.0
+    rmse_histogram: List[int] = field(default_factory=lambda: [0] * (_RMSE_BINS + 2))
+
+    def add(self, user_id: str, ticker: str, model: str, rmse: float):
+        """Учет одной записи журнала"""
+        self.total += 1
+        self.ticker_counts[ticker] += 1
+        self.model_wins[model] += 1
+        self.ticker_model_wins[(ticker, model)] += 1
+        self.users.add(user_id)
+
+        if math.isfinite(rmse) and rmse >= 0:
+            self.rmse_count += 1
+            delta = rmse - self.rmse_mean
+            self.rmse_mean += delta / self.rmse_count
+            self.rmse_m2 += delta * (rmse - self.rmse_mean)
+            self.rmse_min = min(self.rmse_min, rmse)
+            self.rmse_max = max(self.rmse_max, rmse)
+            self.rmse_histogram[self._rmse_bin(rmse)] += 1
+
+    @staticmethod
+    def _rmse_bin(rmse: float) -> int:
+        """Номер корзины: 0 — ниже диапазона, последняя — выше"""
+        if rmse <= 10 ** _RMSE_MIN_EXP:
+            return 0
+        position = (math.log10(rmse) - _RMSE_MIN_EXP) * _RMSE_BINS_PER_DECADE
+        return min(int(position) + 1, _RMSE_BINS + 1)
+
+    def rmse_quantile(self, q: float) -> float:
+        """Приближенный квантиль RMSE (верхняя граница корзины)"""
+        if self.rmse_count == 0:
+            return math.nan
+        target = q * self.rmse_count
+        cumulative = 0
+        for i, count in enumerate(self.rmse_histogram):
+            cumulative += count
+            if cumulative >= target and count > 0:
+                if i == 0:
+                    return 10 ** _RMSE_MIN_EXP
+                if i == _RMSE_BINS + 1:
+                    return self.rmse_max
+                return min(10 ** (_RMSE_MIN_EXP + i / _RMSE_BINS_PER_DECADE), self.rmse_max)
+        return self.rmse_max
+
+    @property
+    def rmse_std(self) -> float:
+        if self.rmse_count < 2:
+            return 0.0
+        return math.sqrt(self.rmse_m2 / (self.rmse_count - 1))
+
+    def win_rates(self) -> Dict[str, float]:
+        """Доля побед каждой модели"""
+        if self.total == 0:
+            return {}
+        return {model: wins / self.total for model, wins in self.model_wins.most_common()}
+
+    def ticker_win_rate(self, ticker: str, model: str) -> Tuple[float, int]:
+        """
+        Доля побед модели на тикере
+
+        Returns:
+            Кортеж (доля побед, число запросов по тикеру)
+        """
+        requests = self.ticker_counts.get(ticker, 0)
+        if requests == 0:
+            return 0.0, 0
+        return self.ticker_model_wins.get((ticker, model), 0) / requests, requests
+
+    def hot_tickers(self, n: int) -> List[str]:
+        """Самые запрашиваемые тикеры (список для прогрева)"""
+        return [ticker for ticker, _ in self.ticker_counts.most_common(n)]
+
+
+class StatsService:
+    """Сервис аналитики по журналу запросов"""
+
+    @staticmethod
+    def _log_files(path: str, include_rotated: bool) -> List[str]:
+        """Файлы журнала от старых к новым"""
+        files = []
+        if include_rotated:
+            i = 1
+            while os.path.exists(f'{path}.{i}'):
+                files.append(f'{path}.{i}')
+                i += 1
+            files.reverse()
+        if os.path.exists(path):
+            files.append(path)
+        return files
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[str]:
+        """Потоковое чтение строк пачками фиксированного размера"""
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            while True:
+                lines = f.readlines(_READ_CHUNK_BYTES)
+                if not lines:
+                    break
+                yield from lines
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[Tuple[str, str, str, float]]:
+        """
+        Разбор строки журнала (формат pipe или jsonl)
+
+        Returns:
+            Кортеж (user_id, тикер, модель, RMSE) или None для поврежденной строки
+        """
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            if line.startswith('{'):
+                record = json.loads(line)
+                return (
+                    str(record['user_id']),
+                    record['ticker'],
+                    record['model'],
+                    float(record['metric'])
+                )
+            # timestamp|user_id|ticker|amount|model|metric|profit
+            parts = line.split('|')
+            if len(parts) != 7:
+                return None
+            return parts[1], parts[2], parts[4], float(parts[5])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def compute(path: str = config.LOG_FILE, include_rotated: bool = True) -> RequestStats:
+        """
+        Статистика по журналу запросов за один проход
+
+        Память не зависит от размера журнала: счетчики по тикерам и
+        моделям, фиксированная гистограмма RMSE и ограниченный топ
+        пользователей
+
+        Args:
+            path: Путь к журналу
+            include_rotated: Учитывать архивные файлы ротации (path.1, path.2, ...)
+
+        Returns:
+            RequestStats
+        """
+        stats = RequestStats()
+        for file_path in StatsService._log_files(path, include_rotated):
+            for line in StatsService._read_lines(file_path):
+                parsed = StatsService.parse_line(line)
+                if parsed is None:
+                    stats.skipped_lines += 1
+                    continue
+                stats.add(*parsed)
+        return stats
+
+    @staticmethod
+    def get_prewarm_list(n: int = config.STATS_HOT_TICKERS, path: str = config.LOG_FILE) -> List[str]:
+        """Самые запрашиваемые тикеры из журнала"""
+        try:
+            return StatsService.compute(path).hot_tickers(n)
+        except OSError as e:
+            logger.error(f"Ошибка чтения журнала запросов: {e}")
+            return []
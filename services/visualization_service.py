@@ -2,106 +2,280 @@
 Сервис для визуализации данных и прогнозов
 """
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import threading
+from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.dates as mdates
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import List
+from datetime import timedelta
+from typing import Dict, List, Tuple
 from config import config
+from utils.metrics import span
+
+# Шаблоны графиков: Figure нельзя использовать из нескольких потоков сразу
+_templates = threading.local()
+
+
+def save_figure(fig: Figure, image_format: str) -> BytesIO:
+    """Сохранение графика в память в формате 'png' или 'webp'"""
+    buffer = BytesIO()
+    if image_format == 'webp':
+        pil_kwargs = {'quality': config.CHART_WEBP_QUALITY}
+    else:
+        pil_kwargs = {'optimize': config.CHART_OPTIMIZE}
+    fig.savefig(
+        buffer,
+        format=image_format,
+        dpi=config.DPI,
+        bbox_inches='tight',
+        pil_kwargs=pil_kwargs
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def downsample_minmax(x: np.ndarray, y: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Прореживание ряда с сохранением минимума и максимума в каждой корзине
+
+    Args:
+        x: Координаты по оси X
+        y: Значения
+        n_buckets: Количество корзин (обычно ширина графика в пикселях)
+
+    Returns:
+        Кортеж (x, y) не более чем из 2 * n_buckets точек
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return x, y
+
+    bucket_size = -(-n // n_buckets)
+    n_buckets = -(-n // bucket_size)
+    padded = np.empty(n_buckets * bucket_size)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    buckets = padded.reshape(n_buckets, bucket_size)
+
+    offsets = np.arange(n_buckets) * bucket_size
+    idx_min = np.minimum(offsets + buckets.argmin(axis=1), n - 1)
+    idx_max = np.minimum(offsets + buckets.argmax(axis=1), n - 1)
+
+    # Внутри корзины точки идут в исходном порядке
+    idx = np.column_stack([np.minimum(idx_min, idx_max), np.maximum(idx_min, idx_max)]).ravel()
+    return x[idx], y[idx]
+
+
+class ChartTemplate:
+    """Заранее оформленный график, в котором обновляются только данные"""
+
+    def __init__(self):
+        self.fig = Figure(figsize=config.FIGURE_SIZE, dpi=config.DPI)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+
+        self.historical_line, = self.ax.plot(
+            [], [],
+            label='Исторические данные',
+            linewidth=2,
+            color='#2E86AB'
+        )
+        self.forecast_line, = self.ax.plot(
+            [], [],
+            label='Прогноз',
+            linewidth=2,
+            linestyle='--',
+            color='#F77F00'
+        )
+        self.buy_points = self.ax.scatter(
+            [], [],
+            color='#06A77D',
+            s=150,
+            marker='^',
+            label='Покупать',
+            zorder=5,
+            edgecolors='black',
+            linewidths=1
+        )
+        self.sell_points = self.ax.scatter(
+            [], [],
+            color='#D62828',
+            s=150,
+            marker='v',
+            label='Продавать',
+            zorder=5,
+            edgecolors='black',
+            linewidths=1
+        )
+
+        self.ax.xaxis_date()
+        self.ax.set_xlabel('Дата', fontsize=12, fontweight='bold')
+        self.ax.set_ylabel('Цена ($)', fontsize=12, fontweight='bold')
+        self.ax.grid(True, alpha=0.3, linestyle='--')
+        self.fig.tight_layout()
+
+        # Ширина области графика в пикселях — предел детализации истории
+        self.width_px = max(1, int(self.ax.get_window_extent().width))
+
+    def render(
+            self,
+            ticker: str,
+            historical: pd.DataFrame,
+            predictions: np.ndarray,
+            buy_days: List[int],
+            sell_days: List[int],
+            image_format: str
+    ) -> BytesIO:
+        """Обновление данных и сохранение изображения"""
+        hist_x = mdates.date2num(historical.index)
+        hist_y = historical['price'].to_numpy(dtype=float)
+        self.historical_line.set_data(*downsample_minmax(hist_x, hist_y, self.width_px))
+
+        future_dates = pd.date_range(
+            start=historical.index[-1] + timedelta(days=1),
+            periods=len(predictions)
+        )
+        future_x = mdates.date2num(future_dates)
+        self.forecast_line.set_data(future_x, predictions)
+
+        buy_days = np.asarray(buy_days, dtype=int)
+        sell_days = np.asarray(sell_days, dtype=int)
+        self.buy_points.set_offsets(np.column_stack([future_x[buy_days], predictions[buy_days]]))
+        self.sell_points.set_offsets(np.column_stack([future_x[sell_days], predictions[sell_days]]))
+
+        self.ax.set_title(
+            f'Прогноз цены акций {ticker} на {config.FORECAST_DAYS} дней',
+            fontsize=14,
+            fontweight='bold'
+        )
+
+        # В легенде только присутствующие на графике сигналы
+        handles = [self.historical_line, self.forecast_line]
+        if len(buy_days):
+            handles.append(self.buy_points)
+        if len(sell_days):
+            handles.append(self.sell_points)
+        self.ax.legend(handles=handles, fontsize=10, loc='best')
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+        return save_figure(self.fig, image_format)
 
 
 class VisualizationService:
     """Сервис для создания графиков"""
 
+    @staticmethod
+    def _get_template() -> ChartTemplate:
+        """Шаблон графика текущего потока"""
+        template = getattr(_templates, 'chart', None)
+        if template is None:
+            template = ChartTemplate()
+            _templates.chart = template
+        return template
+
     @staticmethod
     def plot_prediction(
             ticker: str,
             historical: pd.DataFrame,
             predictions: np.ndarray,
             buy_days: List[int],
-            sell_days: List[int]
-    ) -> str:
+            sell_days: List[int],
+            image_format: str = None
+    ) -> BytesIO:
         """
         Создание графика с прогнозом
 
+        Оформление графика создается один раз на поток, при вызове
+        обновляются только данные. История прореживается до ширины
+        графика в пикселях. Метод можно вызывать из нескольких потоков
+
         Args:
             ticker: Тикер компании
             historical: Исторические данные
             predictions: Прогнозируемые цены
             buy_days: Дни для покупки
             sell_days: Дни для продажи
+            image_format: 'png' или 'webp' (по умолчанию config.CHART_FORMAT)
 
         Returns:
-            Путь к сохраненному файлу
+            Изображение в памяти
         """
-        plt.figure(figsize=config.FIGURE_SIZE)
+        with span('chart_render'):
+            template = VisualizationService._get_template()
+            return template.render(
+                ticker,
+                historical,
+                np.asarray(predictions, dtype=float),
+                buy_days,
+                sell_days,
+                image_format or config.CHART_FORMAT
+            )
 
-        # Исторические данные
-        plt.plot(
-            historical.index,
-            historical['price'],
-            label='Исторические данные',
-            linewidth=2,
-            color='#2E86AB'
-        )
+    @staticmethod
+    def plot_comparison(
+            histories: Dict[str, pd.DataFrame],
+            predictions: Dict[str, np.ndarray],
+            image_format: str = None
+    ) -> BytesIO:
+        """
+        Общий график прогнозов нескольких тикеров
 
-        # Прогноз
-        future_dates = pd.date_range(
-            start=historical.index[-1] + timedelta(days=1),
-            periods=len(predictions)
-        )
-        plt.plot(
-            future_dates,
-            predictions,
-            label='Прогноз',
-            linewidth=2,
-            linestyle='--',
-            color='#F77F00'
-        )
+        Цены показаны в процентах от последней известной цены, чтобы
+        тикеры с разным уровнем цен были сравнимы. Из истории берутся
+        последние config.BATCH_CHART_HISTORY_DAYS дней
 
-        # Сигналы покупки
-        if buy_days:
-            plt.scatter(
-                [future_dates[i] for i in buy_days],
-                [predictions[i] for i in buy_days],
-                color='#06A77D',
-                s=150,
-                marker='^',
-                label='Покупать',
-                zorder=5,
-                edgecolors='black',
-                linewidths=1
-            )
+        Args:
+            histories: Исторические данные {тикер: DataFrame}
+            predictions: Прогнозы {тикер: массив цен}
+            image_format: 'png' или 'webp' (по умолчанию config.CHART_FORMAT)
 
-        # Сигналы продажи
-        if sell_days:
-            plt.scatter(
-                [future_dates[i] for i in sell_days],
-                [predictions[i] for i in sell_days],
-                color='#D62828',
-                s=150,
-                marker='v',
-                label='Продавать',
-                zorder=5,
-                edgecolors='black',
-                linewidths=1
-            )
+        Returns:
+            Изображение в памяти
+        """
+        with span('chart_render'):
+            fig = Figure(figsize=config.FIGURE_SIZE, dpi=config.DPI)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
 
-        plt.xlabel('Дата', fontsize=12, fontweight='bold')
-        plt.ylabel('Цена ($)', fontsize=12, fontweight='bold')
-        plt.title(
-            f'Прогноз цены акций {ticker} на {config.FORECAST_DAYS} дней',
-            fontsize=14,
-            fontweight='bold'
-        )
-        plt.legend(fontsize=10, loc='best')
-        plt.grid(True, alpha=0.3, linestyle='--')
-        plt.tight_layout()
+            for ticker, forecast in predictions.items():
+                history = histories[ticker]['price'].iloc[-config.BATCH_CHART_HISTORY_DAYS:]
+                last_price = history.iloc[-1]
+                hist_x = mdates.date2num(history.index)
+                future_x = mdates.date2num(pd.date_range(
+                    start=history.index[-1] + timedelta(days=1),
+                    periods=len(forecast)
+                ))
 
-        filename = f'{ticker}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-        plt.savefig(filename, dpi=config.DPI, bbox_inches='tight')
-        plt.close()
+                line, = ax.plot(
+                    hist_x,
+                    (history.to_numpy() / last_price - 1) * 100,
+                    linewidth=2,
+                    label=ticker
+                )
+                # Прогноз продолжает историю тем же цветом
+                ax.plot(
+                    np.concatenate([hist_x[-1:], future_x]),
+                    (np.concatenate([[last_price], forecast]) / last_price - 1) * 100,
+                    linewidth=2,
+                    linestyle='--',
+                    color=line.get_color()
+                )
+
+            ax.xaxis_date()
+            ax.axhline(0, color='black', linewidth=1, alpha=0.5)
+            ax.set_title(
+                f'Сравнение прогнозов на {config.FORECAST_DAYS} дней',
+                fontsize=14,
+                fontweight='bold'
+            )
+            ax.set_xlabel('Дата', fontsize=12, fontweight='bold')
+            ax.set_ylabel('Изменение цены (%)', fontsize=12, fontweight='bold')
+            ax.legend(fontsize=10, loc='best')
+            ax.grid(True, alpha=0.3, linestyle='--')
+            fig.tight_layout()
 
-        return filename
\ No newline at end of file
+            return save_figure(fig, image_format or config.CHART_FORMAT)
@@ -2,8 +2,15 @@
 Утилиты для логирования
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import List, Optional
 from config import config
 
 
@@ -19,6 +26,140 @@ def setup_logging():
     )
 
 
+class RequestLogWriter:
+    """
+    Фоновая запись журнала пользовательских запросов
+
+    Записи складываются в очередь и пишутся одним потоком пачками
+    (по размеру пачки или по таймеру), поэтому запрос не ждет
+    файловых операций, а строки разных запросов не перемешиваются
+    """
+
+    def __init__(
+            self,
+            path: str = config.LOG_FILE,
+            log_format: str = config.REQUEST_LOG_FORMAT,
+            batch_size: int = config.REQUEST_LOG_BATCH_SIZE,
+            flush_interval: float = config.REQUEST_LOG_FLUSH_INTERVAL,
+            max_bytes: int = config.REQUEST_LOG_MAX_BYTES,
+            backup_count: int = config.REQUEST_LOG_BACKUP_COUNT
+    ):
+        self.path = path
+        self.log_format = log_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def format_record(self, record: dict) -> str:
+        """Форматирование записи в строку журнала"""
+        if self.log_format == 'jsonl':
+            return json.dumps(record, ensure_ascii=False) + '\n'
+        return (
+            f"{record['timestamp']}|{record['user_id']}|{record['ticker']}|"
+            f"{record['amount']:.2f}|{record['model']}|{record['metric']:.2f}|"
+            f"{record['profit']:.2f}\n"
+        )
+
+    def write(self, record: dict):
+        """Постановка записи в очередь"""
+        self._ensure_started()
+        self._queue.put(self.format_record(record))
+
+    def flush(self):
+        """Дождаться записи всех поставленных в очередь строк"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Запись оставшихся строк и остановка фонового потока"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name='request-log-writer',
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        batch: List[str] = []
+        last_flush = time.monotonic()
+        stop = False
+
+        while not stop:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                line = self._queue.get(timeout=timeout)
+                if line is None:
+                    stop = True
+                    self._queue.task_done()
+                else:
+                    batch.append(line)
+            except queue.Empty:
+                pass
+
+            if batch and (
+                    stop
+                    or len(batch) >= self.batch_size
+                    or time.monotonic() - last_flush >= self.flush_interval
+            ):
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+                last_flush = time.monotonic()
+            elif not batch:
+                last_flush = time.monotonic()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_batch(self, batch: List[str]):
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(''.join(batch))
+            self._file.flush()
+            if self.max_bytes > 0 and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            logging.getLogger(__name__).error(f"Ошибка записи журнала запросов: {e}")
+
+    def _rotate(self):
+        """Ротация: logs.txt -> logs.txt.1 -> ... -> logs.txt.N"""
+        self._file.close()
+        self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{i}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+
+request_log = RequestLogWriter()
+atexit.register(request_log.close)
+
+
 def log_user_request(
         user_id: int,
         ticker: str,
@@ -38,11 +179,12 @@ def log_user_request(
         metric: Метрика качества (RMSE)
         profit: Прибыль
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = (
-        f"{timestamp}|{user_id}|{ticker}|{amount:.2f}|"
-        f"{model}|{metric:.2f}|{profit:.2f}\n"
-    )
-
-    with open(config.LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(log_entry)
\ No newline at end of file
+    request_log.write({
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'user_id': user_id,
+        'ticker': ticker,
+        'amount': amount,
+        'model': model,
+        'metric': metric,
+        'profit': profit
+    })
@@ -0,0 +1,268 @@
+"""
+Замеры времени этапов анализа и HTTP-эндпоинт метрик в формате Prometheus
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+SpanRecord = Tuple[str, Labels, float]
+
+_enabled = config.METRICS_ENABLED
+
+# Замеры текущего запроса (None — запрос не трассируется)
+_trace: contextvars.ContextVar[Optional[List[SpanRecord]]] = contextvars.ContextVar('metrics_trace', default=None)
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными границами корзин"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Гистограммы по имени замера и меткам, плюс функции-источники текущих значений"""
+
+    def __init__(self, buckets: Tuple[float, ...] = config.METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: Labels, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]):
+        """
+        Источник текущих значений (gauge)
+
+        Args:
+            collector: Функция, возвращающая словарь {имя: значение}
+        """
+        self._collectors.append(collector)
+
+    def render(self, prefix: str = config.METRICS_PREFIX) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        with self._lock:
+            items = sorted(
+                (name, labels, list(h.counts), h.sum, h.count)
+                for (name, labels), h in self._histograms.items()
+            )
+
+        lines = []
+        current = None
+        for name, labels, counts, total, count in items:
+            metric = f'{prefix}_{name}_seconds'
+            if name != current:
+                lines.append(f'# TYPE {metric} histogram')
+                current = name
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+
+        for collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик: {e}")
+                continue
+            for name, value in values.items():
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    """Включение замеров (например, в процессе-воркере)"""
+    global _enabled
+    _enabled = enabled
+
+
+def observe(name: str, seconds: float, labels: Labels = ()):
+    """Учет замера в гистограмме и в разбивке текущего запроса"""
+    registry.observe(name, labels, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, labels, seconds))
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name: str, labels: Labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **labels: str):
+    """
+    Замер времени блока кода
+
+    Пример:
+        with span('model_train', model='LSTM'):
+            model.train(data)
+
+    Когда замеры выключены, возвращается общий пустой контекст-менеджер
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, tuple(sorted(labels.items())))
+
+
+@contextmanager
+def request_trace(request_id: str):
+    """
+    Разбивка времени одного запроса по этапам
+
+    Замеры внутри блока (в том числе в пулах потоков и процессов
+    AnalysisExecutor) попадают в отладочный лог при выходе
+    """
+    if not _enabled:
+        yield
+        return
+
+    token = _trace.set([])
+    try:
+        yield
+    finally:
+        trace = _trace.get()
+        _trace.reset(token)
+        if logger.isEnabledFor(logging.DEBUG) and trace:
+            breakdown = ', '.join(
+                f"{name}{'[' + ','.join(value for _, value in labels) + ']' if labels else ''}={seconds:.3f}s"
+                for name, labels, seconds in trace
+            )
+            logger.debug(f"Запрос {request_id}: {breakdown}")
+
+
+def run_collecting(enabled: bool, func: Callable, *args) -> Tuple[Any, List[SpanRecord]]:
+    """
+    Выполнение функции в процессе-воркере с возвратом замеров
+
+    Returns:
+        Кортеж (результат функции, замеры для merge_spans в родительском процессе)
+    """
+    set_enabled(enabled)
+    trace: List[SpanRecord] = []
+    token = _trace.set(trace)
+    try:
+        return func(*args), trace
+    finally:
+        _trace.reset(token)
+
+
+def merge_spans(spans: List[SpanRecord]):
+    """Учет замеров, полученных из процесса-воркера"""
+    for name, labels, seconds in spans:
+        observe(name, seconds, labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с эндпоинтом /metrics"""
+
+    def __init__(self, host: str = config.METRICS_HOST, port: int = config.METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
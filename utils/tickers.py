@@ -0,0 +1,10 @@
+"""
+Проверка тикеров без загрузки модулей анализа
+"""
+
+
+def validate_ticker(ticker: str) -> bool:
+    """Проверка валидности тикера"""
+    if not ticker or len(ticker) > 10:
+        return False
+    return ticker.isalnum()
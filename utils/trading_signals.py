@@ -3,36 +3,290 @@
 """
 
 import numpy as np
-from scipy.signal import argrelextrema
-from typing import List, Tuple
+from dataclasses import dataclass
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Sequence, Tuple
+from utils.metrics import span
+from config import config
+
+
+@dataclass
+class TradeSimulation:
+    """Сделки стратегии на одном прогнозе"""
+
+    buy_days: np.ndarray
+    sell_days: np.ndarray
+    buy_prices: np.ndarray
+    sell_prices: np.ndarray
+    profits: np.ndarray  # Прибыль каждой сделки
+    total_profit: float
 
 
 class TradingSignals:
     """Класс для определения торговых сигналов"""
 
     @staticmethod
-    def find_extrema(predictions: np.ndarray, order: int = 5) -> Tuple[List[int], List[int]]:
+    def find_extrema(
+            predictions: np.ndarray,
+            order: int = 5,
+            min_move: float = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
         Поиск локальных минимумов и максимумов
 
         Args:
             predictions: Массив прогнозируемых цен
             order: Порядок для определения экстремумов
+            min_move: Минимальное движение цены вокруг экстремума, доля
+                (по умолчанию config.SIGNAL_MIN_MOVE)
+
+        Returns:
+            Кортеж массивов (дни покупки, дни продажи)
+        """
+        with span('signals_extrema'):
+            minima, maxima = TradingSignals.find_extrema_batch(predictions, (order,), min_move)
+
+        return np.flatnonzero(minima[0]), np.flatnonzero(maxima[0])
+
+    @staticmethod
+    def find_extrema_batch(
+            predictions: np.ndarray,
+            orders: Sequence[int] = (5,),
+            min_move: float = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Локальные минимумы и максимумы для нескольких порядков и рядов сразу
+
+        Точка i — минимум порядка k, если она строго меньше всех точек
+        в окне [i-k, i+k], обрезанном по краям ряда; первая и последняя
+        точки экстремумами не считаются (как scipy.signal.argrelextrema).
+        Минимумы окон всех порядков считаются за один проход
+        накопительным минимумом по сдвигам ряда.
+
+        При min_move > 0 минимум учитывается, только если в его окне
+        цена с обеих сторон поднимается хотя бы на min_move (доля),
+        максимум — если с обеих сторон опускается
+
+        Args:
+            predictions: Прогнозы формы (n_days,) или (n_series, n_days)
+            orders: Порядки экстремумов
+            min_move: Минимальное движение цены вокруг экстремума, доля
+                (по умолчанию config.SIGNAL_MIN_MOVE)
+
+        Returns:
+            Кортеж булевых масок (минимумы, максимумы) формы
+            (len(orders),) + predictions.shape
+        """
+        min_move = config.SIGNAL_MIN_MOVE if min_move is None else min_move
+        x = np.asarray(predictions, dtype=float)
+        n = x.shape[-1]
+        orders = np.asarray(orders, dtype=np.intp)
+        max_order = int(orders.max())
+
+        # Окно из 2 * max_order + 1 сдвигов: shifts[..., j, i] = x[..., i + j - max_order]
+        pad = [(0, 0)] * (x.ndim - 1) + [(max_order, max_order)]
+        low = sliding_window_view(np.pad(x, pad, constant_values=np.inf), n, axis=-1)
+        high = sliding_window_view(np.pad(x, pad, constant_values=-np.inf), n, axis=-1)
+
+        # Строка k-1 — экстремум окна из k соседей слева или справа
+        left_min = np.minimum.accumulate(low[..., max_order - 1::-1, :], axis=-2)[..., orders - 1, :]
+        right_min = np.minimum.accumulate(low[..., max_order + 1:, :], axis=-2)[..., orders - 1, :]
+        left_max = np.maximum.accumulate(high[..., max_order - 1::-1, :], axis=-2)[..., orders - 1, :]
+        right_max = np.maximum.accumulate(high[..., max_order + 1:, :], axis=-2)[..., orders - 1, :]
+
+        # Порядок — первая ось результата
+        left_min, right_min, left_max, right_max = (
+            np.moveaxis(a, -2, 0) for a in (left_min, right_min, left_max, right_max)
+        )
+
+        minima = (x < left_min) & (x < right_min)
+        maxima = (x > left_max) & (x > right_max)
+
+        if min_move > 0:
+            rise = x * (1 + min_move)
+            fall = x * (1 - min_move)
+            minima &= (left_max >= rise) & (right_max >= rise)
+            maxima &= (left_min <= fall) & (right_min <= fall)
+
+        minima[..., [0, -1]] = False
+        maxima[..., [0, -1]] = False
+        return minima, maxima
+
+    @staticmethod
+    def _pair_trades(
+            buy_keys: np.ndarray,
+            sell_keys: np.ndarray,
+            buy_groups: np.ndarray,
+            sell_groups: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Сопоставление покупок и продаж без перекрытия позиций
+
+        Ключи отсортированы по возрастанию (для нескольких рядов ключ —
+        номер ряда * длина ряда + день). Позиция открывается первой
+        покупкой после закрытия предыдущей и закрывается первой продажей
+        после открытия, поэтому покупка открывает сделку, только если
+        между ней и предыдущей покупкой была продажа
+
+        Returns:
+            Кортеж (индексы покупок, индексы продаж) совершенных сделок
+        """
+        # Первая продажа после каждой покупки
+        next_sell = np.searchsorted(sell_keys, buy_keys, side='right')
+
+        closed = next_sell < len(sell_keys)
+        closed[closed] = sell_groups[next_sell[closed]] == buy_groups[closed]
+
+        opens = np.ones(len(buy_keys), dtype=bool)
+        opens[1:] = (next_sell[1:] != next_sell[:-1]) | (buy_groups[1:] != buy_groups[:-1])
+
+        entries = np.flatnonzero(opens & closed)
+        return entries, next_sell[entries]
+
+    @staticmethod
+    def _trade_returns(
+            buy_prices: np.ndarray,
+            sell_prices: np.ndarray,
+            fee: float,
+            slippage: float
+    ) -> np.ndarray:
+        """Во сколько раз сделка умножает капитал с учетом комиссий и проскальзывания"""
+        buy_cost = buy_prices * (1 + slippage)
+        sell_proceeds = sell_prices * (1 - slippage)
+        return (1 - fee) ** 2 * sell_proceeds / buy_cost
+
+    @staticmethod
+    def simulate_trades(
+            predictions: np.ndarray,
+            investment: float,
+            buy_days: Sequence[int],
+            sell_days: Sequence[int],
+            fee: float = None,
+            slippage: float = None
+    ) -> TradeSimulation:
+        """
+        Симуляция стратегии на одном прогнозе
+
+        В каждый момент открыта не более чем одна позиция, выручка от
+        продажи полностью вкладывается в следующую покупку
+
+        Args:
+            predictions: Массив прогнозируемых цен
+            investment: Сумма инвестиции
+            buy_days: Дни для покупки
+            sell_days: Дни для продажи
+            fee: Комиссия с каждой покупки и продажи, доля (по умолчанию config.TRADING_FEE)
+            slippage: Проскальзывание цены, доля (по умолчанию config.TRADING_SLIPPAGE)
+
+        Returns:
+            TradeSimulation
+        """
+        fee = config.TRADING_FEE if fee is None else fee
+        slippage = config.TRADING_SLIPPAGE if slippage is None else slippage
+
+        predictions = np.asarray(predictions, dtype=float)
+        buys = np.unique(np.asarray(buy_days, dtype=np.intp))
+        sells = np.unique(np.asarray(sell_days, dtype=np.intp))
+
+        buy_idx, sell_idx = TradingSignals._pair_trades(
+            buys, sells, np.zeros(len(buys), dtype=np.intp), np.zeros(len(sells), dtype=np.intp)
+        )
+        trade_buys = buys[buy_idx]
+        trade_sells = sells[sell_idx]
+        buy_prices = predictions[trade_buys]
+        sell_prices = predictions[trade_sells]
+
+        returns = TradingSignals._trade_returns(buy_prices, sell_prices, fee, slippage)
+        # Капитал перед каждой сделкой
+        capital = investment * np.cumprod(np.concatenate([[1.0], returns[:-1]]))
+        profits = capital * (returns - 1)
+
+        return TradeSimulation(
+            buy_days=trade_buys,
+            sell_days=trade_sells,
+            buy_prices=buy_prices,
+            sell_prices=sell_prices,
+            profits=profits,
+            total_profit=float(profits.sum())
+        )
+
+    @staticmethod
+    def simulate_batch(
+            predictions: np.ndarray,
+            buy_mask: np.ndarray,
+            sell_mask: np.ndarray,
+            investments=1.0,
+            fee: float = None,
+            slippage: float = None
+    ) -> np.ndarray:
+        """
+        Прибыль стратегии для многих прогнозов и сумм инвестиций сразу
+
+        Args:
+            predictions: Прогнозы формы (n_paths, n_days)
+            buy_mask: Булева маска дней покупки той же формы
+            sell_mask: Булева маска дней продажи той же формы
+            investments: Сумма или массив сумм инвестиции
+            fee: Комиссия с каждой покупки и продажи, доля (по умолчанию config.TRADING_FEE)
+            slippage: Проскальзывание цены, доля (по умолчанию config.TRADING_SLIPPAGE)
 
         Returns:
-            Кортеж (дни покупки, дни продажи)
+            Прибыль формы (n_paths,) + форма investments
         """
-        local_min = argrelextrema(predictions, np.less, order=order)[0]
-        local_max = argrelextrema(predictions, np.greater, order=order)[0]
+        fee = config.TRADING_FEE if fee is None else fee
+        slippage = config.TRADING_SLIPPAGE if slippage is None else slippage
+
+        prices = np.atleast_2d(np.asarray(predictions, dtype=float))
+        n_paths, n_days = prices.shape
 
-        return local_min.tolist(), local_max.tolist()
+        # nonzero обходит маску построчно: ключи уже отсортированы
+        buy_paths, buy_days = np.nonzero(np.atleast_2d(buy_mask))
+        sell_paths, sell_days = np.nonzero(np.atleast_2d(sell_mask))
+
+        buy_idx, sell_idx = TradingSignals._pair_trades(
+            buy_paths * n_days + buy_days,
+            sell_paths * n_days + sell_days,
+            buy_paths,
+            sell_paths
+        )
+        returns = TradingSignals._trade_returns(
+            prices[buy_paths[buy_idx], buy_days[buy_idx]],
+            prices[sell_paths[sell_idx], sell_days[sell_idx]],
+            fee,
+            slippage
+        )
+
+        # Произведение доходностей сделок каждого ряда
+        growth = np.zeros(n_paths)
+        trade_paths = buy_paths[buy_idx]
+        if len(trade_paths):
+            starts = np.flatnonzero(np.concatenate([[True], trade_paths[1:] != trade_paths[:-1]]))
+            growth[trade_paths[starts]] = np.multiply.reduceat(returns, starts) - 1
+
+        return np.multiply.outer(growth, np.asarray(investments, dtype=float))
+
+    @staticmethod
+    def format_strategy(simulation: TradeSimulation) -> str:
+        """Описание сделок для отчета"""
+        return "\n\n".join(
+            f"📅 День {buy_day+1}: Купить по ${buy_price:.2f}\n"
+            f"📅 День {sell_day+1}: Продать по ${sell_price:.2f}\n"
+            f"💵 Прибыль от сделки: ${profit:.2f}"
+            for buy_day, sell_day, buy_price, sell_price, profit in zip(
+                simulation.buy_days.tolist(),
+                simulation.sell_days.tolist(),
+                simulation.buy_prices.tolist(),
+                simulation.sell_prices.tolist(),
+                simulation.profits.tolist()
+            )
+        )
 
     @staticmethod
     def calculate_profit(
             predictions: np.ndarray,
             investment: float,
-            buy_days: List[int],
-            sell_days: List[int]
+            buy_days: Sequence[int],
+            sell_days: Sequence[int]
     ) -> Tuple[float, str]:
         """
         Расчет потенциальной прибыли
@@ -46,34 +300,12 @@ class TradingSignals:
         Returns:
             Кортеж (общая прибыль, описание стратегии)
         """
-        if not buy_days or not sell_days:
+        if not len(buy_days) or not len(sell_days):
             return 0.0, "Недостаточно сигналов для расчета стратегии"
 
-        strategy = []
-        total_profit = 0
-
-        for buy_day in buy_days:
-            # Находим следующий день продажи после покупки
-            sell_candidates = [d for d in sell_days if d > buy_day]
-
-            if sell_candidates:
-                sell_day = sell_candidates[0]
-                buy_price = predictions[buy_day]
-                sell_price = predictions[sell_day]
-
-                # Расчет прибыли от одной сделки
-                shares = investment / buy_price
-                profit = shares * (sell_price - buy_price)
-                total_profit += profit
-
-                strategy.append(
-                    f"📅 День {buy_day+1}: Купить по ${buy_price:.2f}\n"
-                    f"📅 День {sell_day+1}: Продать по ${sell_price:.2f}\n"
-                    f"💵 Прибыль от сделки: ${profit:.2f}"
-                )
+        simulation = TradingSignals.simulate_trades(predictions, investment, buy_days, sell_days)
 
-        if not strategy:
+        if not len(simulation.buy_days):
             return 0.0, "Нет выгодных точек для покупки и продажи"
 
-        strategy_text = "\n\n".join(strategy)
-        return total_profit, strategy_text
\ No newline at end of file
+        return simulation.total_profit, TradingSignals.format_strategy(simulation)
@@ -0,0 +1,57 @@
+"""
+Отложенная загрузка тяжелых модулей
+"""
+
+import importlib
+import logging
+import threading
+import time
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# Модули, нужные для анализа тикера (pandas, torch, statsmodels, sklearn, scipy, matplotlib)
+ANALYSIS_MODULES = (
+    'services.data_service',
+    'services.model_cache',
+    'services.prediction_service',
+    'services.model_selection',
+    'models.random_forest',
+    'models.arima_model',
+    'models.lstm_model',
+    'utils.trading_signals',
+    'services.visualization_service',
+    'services.analysis_service',
+)
+
+_import_lock = threading.Lock()
+
+
+def import_modules(modules: Iterable[str] = ANALYSIS_MODULES):
+    """
+    Импорт модулей с замером времени
+
+    Повторный вызов для уже загруженных модулей почти бесплатен
+    """
+    with _import_lock:
+        for module_name in modules:
+            start = time.perf_counter()
+            importlib.import_module(module_name)
+            elapsed = time.perf_counter() - start
+            if elapsed > 0.05:
+                logger.info(f"Загружен модуль {module_name} за {elapsed:.2f} с")
+
+
+def start_background_warmup() -> threading.Thread:
+    """Загрузка модулей анализа в фоновом потоке после старта бота"""
+
+    def warm_up():
+        try:
+            import_modules()
+            logger.info("Модули анализа загружены")
+        except Exception as e:
+            logger.error(f"Ошибка предварительной загрузки модулей: {e}")
+
+    thread = threading.Thread(target=warm_up, name='import-warmup', daemon=True)
+    thread.start()
+    return thread